@@ -1,17 +1,18 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import yfinance as yf
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from twilio.rest import Client
-import re
 import time
-import math
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 import numpy as np 
+from stockpulse.alerts import ACTIVE, AlertStore
+from stockpulse.config import DEFAULT_MARKET_SYMBOLS, DEFAULT_SHEET_ID
+from stockpulse.cycle import run_cycle
+from stockpulse import metrics, notify
+from stockpulse.history import HistoryStore
+from stockpulse.inbound import InboundServer, SeenIndex
+from stockpulse.quotes import QuoteCache, close_matrix, last_and_change, last_prices, recent_history
+from stockpulse.smartsl import parse_portfolio, smart_sl_table
+from stockpulse.storage import check_pin, hash_pin, make_backend, user_key
+from stockpulse.views import active_grid, page_count
 
 # ==========================================
 # 0. CONFIGURATION & SECRETS
@@ -24,50 +25,89 @@ try:
     TWILIO_SID = st.secrets.get("TWILIO_ACCOUNT_SID", "")
     TWILIO_TOKEN = st.secrets.get("TWILIO_AUTH_TOKEN", "")
     TWILIO_FROM = st.secrets.get("TWILIO_PHONE_NUMBER", "")
-    GCP_SECRETS = st.secrets["gcp_service_account"]
+    STORAGE_BACKEND = st.secrets.get("STORAGE_BACKEND", "sheets")
+    SQLITE_PATH = st.secrets.get("SQLITE_PATH", "stockpulse.db")
+    QUOTE_TTL = float(st.secrets.get("QUOTE_TTL", 30))
+    HISTORY_DIR = st.secrets.get("HISTORY_DIR", "history")
+    MARKET_SYMBOLS = dict(st.secrets.get("MARKET_SYMBOLS", DEFAULT_MARKET_SYMBOLS))
+    SHEET_ID = st.secrets.get("SHEET_ID", DEFAULT_SHEET_ID)
+    # False when `python -m stockpulse.poller` runs next to the app: the UI then only reads results
+    POLL_IN_UI = bool(st.secrets.get("POLL_IN_UI", True))
+    INBOUND_PORT = int(st.secrets.get("INBOUND_PORT", 0))
+    INBOUND_URL = st.secrets.get("INBOUND_URL", "")
+    INBOUND_SEEN_PATH = st.secrets.get("INBOUND_SEEN_PATH", "inbound_seen.json")
+    METRICS_PORT = int(st.secrets.get("METRICS_PORT", 0))
+    GCP_SECRETS = st.secrets["gcp_service_account"] if STORAGE_BACKEND == "sheets" else {}
 except Exception:
     st.error("❌ Error loading secrets. Please check your secrets.toml file.")
     st.stop()
 
-SMTP_SERVER = "smtp.gmail.com"
-SMTP_PORT = 587
-SHEET_ID = "18GROVu8c2Hx5n4H2FiZrOeLXgH9xJG0miPqfgdb-V9w"
+PAGE_SIZES = [25, 50, 100, 250]
 
 # ==========================================
 # 1. DATABASE FUNCTIONS
 # ==========================================
-def get_db_connection():
-    scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-    try:
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(GCP_SECRETS, scope)
-        client = gspread.authorize(creds)
-        sheet = client.open_by_key(SHEET_ID).sheet1
-        return sheet
+@st.cache_resource
+def get_storage():
+    return make_backend(STORAGE_BACKEND, credentials=GCP_SECRETS, sheet_id=SHEET_ID, path=SQLITE_PATH)
+
+@st.cache_resource
+def get_quote_cache():
+    return QuoteCache(ttl=QUOTE_TTL)
+
+@st.cache_resource
+def get_history_store():
+    return HistoryStore(HISTORY_DIR)
+
+@st.cache_data(ttl=60)
+def get_contacts():
+    return get_storage().contacts()  # errors are not cached
+
+def load_contacts():
+    # None when storage can't be read: every partition then counts as PIN-protected
+    try: return get_contacts()
+    except Exception: return None
+
+def save_contact(user, email, phone, pin=None):
+    try: get_storage().save_contact(user, email, phone, pin)
     except Exception as e:
-        st.error(f"❌ Database Connection Error: {e}")
-        return None
+        st.error(f"Error saving settings: {e}")
+        return False
+    finally: get_contacts.clear()
+    return True
+
+def is_claimed(user):
+    contacts = load_contacts()
+    return contacts is None or bool(contacts.get(user, {}).get("pin"))
+
+def is_open(user):
+    """A partition's alerts are readable once its PIN was entered this session, or while nobody has set one."""
+    return user in st.session_state.unlocked or not is_claimed(user)
+
+def own_contact():
+    # Where the open partition's alerts are delivered; read server side, never shown unless unlocked
+    return (load_contacts() or {}).get(st.session_state.user_id, {})
 
 def load_data_from_db():
-    sheet = get_db_connection()
-    if not sheet: return pd.DataFrame()
+    if not is_open(st.session_state.user_id):
+        st.session_state.db_mirror = None
+        return AlertStore()
     try:
-        data = sheet.get_all_records()
-        df = pd.DataFrame(data)
-        expected_cols = ["ticker", "target_price", "current_price", "direction", "notes", "created_at", "status", "triggered_at"]
-        if df.empty: return pd.DataFrame(columns=expected_cols)
-        for col in expected_cols:
-            if col not in df.columns: df[col] = ""
-        return df
+        store, st.session_state.db_mirror = get_storage().load(st.session_state.user_id)
+        return store
     except Exception as e:
-        return pd.DataFrame(columns=["ticker", "target_price", "current_price", "direction", "notes", "created_at", "status", "triggered_at"])
+        st.error(f"❌ Database Connection Error: {e}")
+        st.session_state.db_mirror = None
+        return AlertStore()
 
-def sync_db(df):
-    sheet = get_db_connection()
-    if not sheet: return
-    df_save = df.copy().astype(str)
+def sync_db(store):
     try:
-        sheet.clear()
-        sheet.update([df_save.columns.values.tolist()] + df_save.values.tolist())
+        if st.session_state.get('db_mirror') is None:
+            # The alerts never loaded: diffing this store against the sheet would delete every row
+            if not is_open(st.session_state.user_id): st.error("Not saved: enter this user's PIN under ⚙️ Connection first.")
+            else: st.error("Not saved: alerts could not be loaded from the database. Reload the page.")
+            return
+        get_storage().save(store, st.session_state.db_mirror, st.session_state.user_id)
     except Exception as e:
         st.error(f"Error saving to DB: {e}")
 
@@ -75,166 +115,135 @@ def sync_db(df):
 # 2. LOGIC HELPERS
 # ==========================================
 def is_duplicate_alert(ticker, target, direction):
-    if st.session_state.alert_db.empty: return False
-    active_mask = st.session_state.alert_db['status'] == 'Active'
-    df_active = st.session_state.alert_db[active_mask]
-    if df_active.empty: return False
-    try:
-        target_float = float(target)
-        check_df = df_active.copy()
-        check_df['target_float'] = pd.to_numeric(check_df['target_price'], errors='coerce')
-        duplicate = check_df[(check_df['ticker'] == ticker) & (check_df['target_float'] == target_float) & (check_df['direction'] == direction)]
-        return not duplicate.empty
-    except: return False
+    return st.session_state.alert_db.is_duplicate(ticker, target, direction)
 
 def get_market_status():
-    tickers = {'S&P 500': '^GSPC', 'Nasdaq': '^IXIC', 'VIX': '^VIX', 'Bitcoin': 'BTC-USD'}
-    results = {}
-    for name, symbol in tickers.items():
-        try:
-            ticker = yf.Ticker(symbol)
-            hist = ticker.history(period="5d")
-            if hist.empty:
-                 results[name] = (0.0, 0.0)
-                 continue
-            price = hist['Close'].iloc[-1]
-            if len(hist) >= 2:
-                prev_close = hist['Close'].iloc[-2]
-                delta = ((price - prev_close) / prev_close) * 100
-            else:
-                delta = 0.0
-             
-            try: price = float(price) 
-            except: price = 0.0
-            if math.isnan(price): price = 0.0
-            try: delta = float(delta) 
-            except: delta = 0.0
-            if math.isnan(delta): delta = 0.0
-            results[name] = (price, delta)
-        except Exception as e:
-            results[name] = (0.0, 0.0)
-    return results
+    names = list(MARKET_SYMBOLS)
+    try: history = recent_history([MARKET_SYMBOLS[n] for n in names], get_quote_cache())
+    except Exception: history = {}
+    closes = close_matrix({n: history.get(MARKET_SYMBOLS[n]) for n in names})
+    prices, deltas = last_and_change(closes)
+    return {n: (float(p), float(d)) for n, p, d in zip(names, prices, deltas)}
+
+def dashboard_html(market_data):
+    """Market cards; a ``None`` quote renders as a placeholder card."""
+    html_out = '<div class="dashboard-grid">'
+    for label, quote in market_data.items():
+        if quote is None: vs, ds, col = "…", "", "#444"
+        else:
+            v, d = quote
+            inverse = MARKET_SYMBOLS[label].startswith("^VIX")  # fear gauges are green when falling
+            vs = f"{v:,.0f}" if v >= 100 else f"{v:.2f}"
+            ds = f"{d:+.2f}%"
+            col = "#00E676" if (not inverse and d >= 0) or (inverse and d < 0) else "#FF4B4B"
+        html_out += f'<div class="market-card" style="border-left: 3px solid {col};"><div class="market-title">{label}</div><div class="market-value">{vs}</div><div class="market-delta" style="color:{col}">{ds}</div></div>'
+    return html_out + '</div>'
+
+@st.fragment(run_every=60)
+def market_dashboard(slot):
+    # Called last so the quotes download never holds back the rest of the page
+    slot.markdown(dashboard_html(get_market_status()), unsafe_allow_html=True)
 
 # ==========================================
 # 3. ANALYSIS & NOTIFICATIONS
 # ==========================================
 def calculate_smart_sl(ticker, buy_price):
     try:
-        stock = yf.Ticker(ticker)
-        hist = stock.history(period="1y")
-        if len(hist) < 150: return None, "Not enough data for MA150"
-        hist['MA150'] = hist['Close'].rolling(window=150).mean()
-        high_low = hist['High'] - hist['Low']
-        high_close = (hist['High'] - hist['Close'].shift()).abs()
-        low_close = (hist['Low'] - hist['Close'].shift()).abs()
-        tr = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-        hist['ATR'] = tr.rolling(window=14).mean()
-        latest = hist.iloc[-1]
-        ma150 = latest['MA150']
-        atr = latest['ATR']
-        curr_price = latest['Close']
-        entry = buy_price if buy_price > 0 else curr_price
-        
-        sl_atr = entry - (2 * atr)
-        final_sl = sl_atr
-        reason = "Volatility (2x ATR)"
-        sl_max_loss = entry * 0.88
-        if final_sl < sl_max_loss: final_sl = sl_max_loss; reason = "Max Loss Limit (12%)"
-        if curr_price > ma150 and final_sl < ma150: final_sl = ma150; reason = "MA150 Support Rule"
-        if final_sl >= curr_price: final_sl = curr_price * 0.99; reason = "Immediate Exit (Price violated rules)"
-
-        trend = "UP 🟢" if curr_price > ma150 else "DOWN 🔴"
-        return {"ma150": ma150, "atr": atr, "trend": trend, "sl_price": final_sl, "current_price": curr_price, "reason": reason, "entry": entry}, None
+        row = smart_sl_table([ticker], [buy_price], store=get_history_store()).iloc[0]
+        if row['error']: return None, row['error']
+        return {k: row[k] for k in ["ma150", "atr", "trend", "sl_price", "current_price", "reason", "entry"]}, None
     except Exception as e: return None, str(e)
 
-def send_email_alert(to_email, ticker, current_price, target_price, direction, notes):
-    if not SENDER_EMAIL or not SENDER_PASSWORD: return False, "Secrets missing"
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = SENDER_EMAIL; msg['To'] = to_email
-        msg['Subject'] = f"🚀 StockPulse: {ticker} hit ${current_price:,.2f}"
-        body = f"Ticker: {ticker}\nPrice: ${current_price}\nTarget: ${target_price}\nDirection: {direction}\nNote: {notes}\nTime: {datetime.now()}"
-        msg.attach(MIMEText(body, 'plain'))
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        server.starttls(); server.login(SENDER_EMAIL, SENDER_PASSWORD)
-        server.sendmail(SENDER_EMAIL, to_email, msg.as_string())
-        server.quit()
-        return True, "Email Sent"
-    except Exception as e: return False, str(e)
-
-def send_whatsapp_alert(to_number, ticker, current_price, target_price, direction):
-    if not TWILIO_SID: return False, "Secrets missing"
-    clean_digits = re.sub(r'\D', '', str(to_number))
-    if clean_digits.startswith("0"): clean_digits = "972" + clean_digits[1:]
-    try:
-        client = Client(TWILIO_SID, TWILIO_TOKEN)
-        msg_body = f"🚀 *{ticker}* Alert!\nPrice: ${current_price:.2f}\nTarget: ${target_price}\nDirection: {direction}"
-        client.messages.create(from_=TWILIO_FROM, body=msg_body, to=f"whatsapp:+{clean_digits}")
-        return True, "WA Sent"
-    except Exception as e: return False, str(e)
+def add_smart_sl_alerts(table):
+    """Turn a Smart SL table into "Down" alerts with one append and one sync; returns (added, skipped)."""
+    added, skipped = 0, 0
+    for row in table[table['error'] == ""].itertuples():
+        sl_target = round(float(row.sl_price), 2)
+        if is_duplicate_alert(row.ticker, sl_target, "Down"): skipped += 1; continue
+        st.session_state.alert_db.add(row.ticker, sl_target, "Down", "Smart SL", current_price=row.current_price)
+        added += 1
+    if added: sync_db(st.session_state.alert_db)
+    return added, skipped
+
+@st.cache_resource
+def get_dispatcher():
+    return notify.make_dispatcher(SENDER_EMAIL, SENDER_PASSWORD, TWILIO_SID, TWILIO_TOKEN, TWILIO_FROM)
+
+@st.cache_resource
+def get_inbound():
+    # The webhook lives in whichever process evaluates alerts
+    if not INBOUND_PORT or not POLL_IN_UI: return None
+    try: return InboundServer(port=INBOUND_PORT, seen=SeenIndex(INBOUND_SEEN_PATH), auth_token=TWILIO_TOKEN, public_url=INBOUND_URL).start()
+    except (OSError, ValueError) as e:
+        st.warning(f"WhatsApp webhook not started: {e}")
+        return None
 
 def process_incoming_whatsapp():
-    if not TWILIO_SID: return
-    try:
-        client = Client(TWILIO_SID, TWILIO_TOKEN)
-        raw_phone = str(st.session_state.user_phone)
-        digits_only = re.sub(r'\D', '', raw_phone)
-        if digits_only.startswith("0"): digits_only = "972" + digits_only[1:]
-        expected_sender = f"whatsapp:+{digits_only}"
-        messages = client.messages.list(limit=5, to=TWILIO_FROM)
-        changes = False
-        for msg in messages:
-            if msg.direction == 'inbound' and msg.from_ == expected_sender and msg.sid not in st.session_state.processed_msgs:
-                st.session_state.processed_msgs.add(msg.sid)
-                match = re.match(r"^([A-Z]+)\s+(\d+(\.\d+)?)$", msg.body.strip().upper())
-                if match:
-                    t, p = match.group(1), float(match.group(2))
-                    if not is_duplicate_alert(t, p, "Up"):
-                        new = {"ticker": t, "target_price": p, "current_price": 0.0, "direction": "Up", "notes": "WA Add", "created_at": str(datetime.now()), "status": "Active", "triggered_at": ""}
-                        st.session_state.alert_db = pd.concat([st.session_state.alert_db, pd.DataFrame([new])], ignore_index=True)
-                        changes = True
-                        st.toast(f"✅ WA Added: {t}")
-        if changes: sync_db(st.session_state.alert_db)
-    except: pass
+    inbound = get_inbound()
+    if inbound is None: return
+    # Leave other users' commands queued for their own sessions (or the poller)
+    phone = own_contact().get("phone", "")
+    others = [c['phone'] for u, c in (load_contacts() or {}).items() if u != st.session_state.user_id]
+    added = inbound.drain_to({phone: st.session_state.alert_db}, keep=others).get(phone, [])
+    for t, _, _ in added: st.toast(f"✅ WA Added: {t}")
+    if added: sync_db(st.session_state.alert_db)
+
+def notify_triggered(row, price):
+    trigger = notify.make_trigger(row, price)
+    contact = own_contact()
+    get_dispatcher().enqueue("email", contact.get("email"), trigger)
+    get_dispatcher().enqueue("whatsapp", contact.get("phone"), trigger)
+    st.toast(f"🔥 Triggered: {row['ticker']}")
 
 def check_alerts():
-    process_incoming_whatsapp()
-    if st.session_state.alert_db.empty: return
-    active_indices = st.session_state.alert_db.index[st.session_state.alert_db['status'] == 'Active'].tolist()
-    if not active_indices: return
-    active_df = st.session_state.alert_db.loc[active_indices]
-    tickers = active_df['ticker'].unique().tolist()
-    if not tickers: return
-    try:
-        data = yf.download(tickers, period="1d", progress=False)['Close']
-        if len(tickers) == 1:
-            val = data.iloc[-1]
-            current_prices = {tickers[0]: val.item() if hasattr(val, 'item') else val}
-        else:
-            current_prices = data.iloc[-1].to_dict()
-    except: return
-
-    changes_made = False
-    for idx in active_indices:
-        row = st.session_state.alert_db.loc[idx]
-        tkr = row['ticker']
-        price = current_prices.get(tkr, 0)
-        if price > 0:
-            st.session_state.alert_db.at[idx, 'current_price'] = price
-            tgt = float(row['target_price'])
-            direct = row['direction']
-            triggered = (direct == "Up" and price >= tgt) or (direct == "Down" and price <= tgt)
-            if triggered:
-                if st.session_state.user_email: send_email_alert(st.session_state.user_email, tkr, price, tgt, direct, row['notes'])
-                if st.session_state.user_phone: send_whatsapp_alert(st.session_state.user_phone, tkr, price, tgt, direct)
-                st.session_state.alert_db.at[idx, 'status'] = 'Completed'
-                st.session_state.alert_db.at[idx, 'triggered_at'] = str(datetime.now())
-                st.toast(f"🔥 Triggered: {tkr}")
-                changes_made = True
-    if changes_made:
-        sync_db(st.session_state.alert_db)
+    with metrics.span("cycle"):
+        process_incoming_whatsapp()
+        try: fired, _ = run_cycle(st.session_state.alert_db, get_quote_cache(), notify_triggered)
+        except Exception as e:
+            st.toast(f"⚠️ Price check failed: {e}")
+            return
+        get_dispatcher().flush()  # one digest per recipient, sent by the worker pool
+        if len(fired): sync_db(st.session_state.alert_db)
+    if len(fired): st.rerun()
+
+def refresh_from_db():
+    if not is_open(st.session_state.user_id): return
+    try: store, mirror = get_storage().load(st.session_state.user_id)
+    except Exception: return
+    if not store.frame().equals(st.session_state.alert_db.frame()):
+        st.session_state.alert_db, st.session_state.db_mirror = store, mirror
         st.rerun()
 
+@st.fragment(run_every=60)
+def auto_poll():
+    # Runs on its own timer without blocking the script thread
+    if POLL_IN_UI: check_alerts()
+    else: refresh_from_db()
+
+# ==========================================
+# 4. METRICS
+# ==========================================
+@st.cache_resource
+def get_metrics_server():
+    # Prometheus scrape target for this process (off unless METRICS_PORT is set)
+    if not METRICS_PORT: return None
+    try: return metrics.serve(METRICS_PORT)
+    except OSError as e:
+        st.warning(f"Metrics endpoint not started: {e}")
+        return None
+
+def metrics_page():
+    """Full-page metrics view, opened with ``?metrics``."""
+    st.markdown("### 📈 Metrics")
+    summary = metrics.summary()
+    for k, v in summary["gauges"].items(): st.caption(f"{k}: {v:,.1f}")
+    st.markdown("**Stages**")
+    st.dataframe(pd.DataFrame(summary["stages"]), hide_index=True, use_container_width=True)
+    st.markdown("**Upstreams**")
+    st.dataframe(pd.DataFrame(summary["upstreams"]), hide_index=True, use_container_width=True)
+    with st.expander("JSON"): st.json(metrics.snapshot())
+    with st.expander("Prometheus"): st.code(metrics.prometheus_text(), language="text")
+
 # ==========================================
 # 5. UI & CSS (THE NUCLEAR "NO-WRAP" FIX)
 # ==========================================
@@ -285,19 +294,6 @@ def apply_custom_ui():
             overflow: hidden !important;    /* Clip content if needed, don't break layout */
         }
         
-        /* Table Headers */
-        .tbl-header { 
-            font-size: 0.65rem; color: #888; font-weight: bold; text-transform: uppercase; 
-            text-align: center; background: #161616; padding: 6px 0; border-bottom: 1px solid #333;
-            white-space: nowrap;
-        }
-        
-        /* Table Cells */
-        .tbl-cell { 
-            font-family: 'Roboto Mono', monospace; font-size: 0.8rem; color: #fff; 
-            padding: 10px 0; text-align: center; height: 40px; display: flex; align-items: center; justify-content: center;
-        }
-        
         /* Buttons (Streamlit Native override - Minimalist) */
         div.stButton > button {
             padding: 0px !important; margin: 0px !important;
@@ -310,8 +306,6 @@ def apply_custom_ui():
         }
         div.stButton > button:hover { background: #222 !important; color: #fff !important; }
         
-        /* Visual Row Separator */
-        .row-border { height: 1px; width: 100%; margin: 0; }
 
     </style>
     """, unsafe_allow_html=True)
@@ -322,11 +316,12 @@ def apply_custom_ui():
 def main():
     apply_custom_ui()
     
-    # Init Session
-    if 'user_email' not in st.session_state: st.session_state.user_email = ""
-    if 'user_phone' not in st.session_state: st.session_state.user_phone = ""
-    if 'processed_msgs' not in st.session_state: st.session_state.processed_msgs = set()
-    if 'alert_db' not in st.session_state: st.session_state.alert_db = load_data_from_db()
+    # Init Session (nothing here touches the network: the page shell paints first)
+    if 'user_id' not in st.session_state:
+        # Each user's alerts and contacts are their own partition; ?user= keeps it across visits
+        st.session_state.user_id = user_key(st.query_params.get("user", ""))
+    # Partitions whose PIN this session entered; a user name alone opens nothing another user protected
+    if 'unlocked' not in st.session_state: st.session_state.unlocked = set()
     if 'edit_ticker' not in st.session_state: st.session_state.edit_ticker = ""
     if 'edit_price' not in st.session_state: st.session_state.edit_price = 0.0
     if 'edit_note' not in st.session_state: st.session_state.edit_note = ""
@@ -336,77 +331,66 @@ def main():
     with c1: st.markdown("<h3 style='margin:0; color:#FFC107;'>StockPulse</h3>", unsafe_allow_html=True)
     with c2: st.markdown(f"<div style='text-align:right;color:#888;padding-top:8px;'>{datetime.now():%H:%M}</div>", unsafe_allow_html=True)
 
-    # DASHBOARD
-    market_data = get_market_status()
-    # Linear HTML construction
-    html_out = '<div class="dashboard-grid">'
-    for label, key in [("S&P 500","S&P 500"),("Nasdaq","Nasdaq"),("VIX","VIX"),("Bitcoin","Bitcoin")]:
-        v, d = market_data.get(key, (0,0))
-        vs = f"{v:,.0f}" if key != "VIX" else f"{v:.2f}"
-        ds = f"{d:+.2f}%"
-        col = "#00E676" if (key != "VIX" and d >= 0) or (key == "VIX" and d < 0) else "#FF4B4B"
-        html_out += f'<div class="market-card" style="border-left: 3px solid {col};"><div class="market-title">{label}</div><div class="market-value">{vs}</div><div class="market-delta" style="color:{col}">{ds}</div></div>'
-    html_out += '</div>'
-    st.markdown(html_out, unsafe_allow_html=True)
-
-    # SETTINGS
-    with st.expander("⚙️ Connection", expanded=False):
-        c1, c2 = st.columns(2)
-        with c1: st.text_input("Email", key="temp_email", value=st.session_state.user_email)
-        with c2: st.text_input("WhatsApp", key="temp_phone", value=st.session_state.user_phone)
-        if st.button("Save Settings", type="primary"):
-            st.session_state.user_email = st.session_state.temp_email
-            st.session_state.user_phone = st.session_state.temp_phone
-            st.success("Saved!")
-        if st.toggle("🔄 Auto-Poll (60s)"):
-            check_alerts()
-            time.sleep(60)
-            st.rerun()
+    # DASHBOARD: placeholder cards now, quotes filled in last by their own fragment
+    dashboard = st.empty()
+    dashboard.markdown(dashboard_html(dict.fromkeys(MARKET_SYMBOLS)), unsafe_allow_html=True)
+    settings = st.expander("⚙️ Connection", expanded=False)
 
     # TABS
     tab_alerts, tab_calc, tab_hist = st.tabs(["🔔 Active", "🛡️ Calc", "📂 Log"])
     
     # 1. ALERTS TAB
     with tab_alerts:
-        active = st.session_state.alert_db[st.session_state.alert_db['status'] == 'Active']
-        if active.empty:
+        if 'alert_db' not in st.session_state:
+            with st.spinner("Loading alerts..."): st.session_state.alert_db = load_data_from_db()
+        if not is_open(st.session_state.user_id):
+            st.info(f"🔒 {st.session_state.user_id}'s alerts are protected by a PIN: enter it under ⚙️ Connection.")
+        n_active = len(st.session_state.alert_db.positions("Active"))
+        if not n_active:
             st.info("No active alerts")
         else:
-            # HEADER (Fixed Ratios for Mobile)
-            # Ratios tuned to squeeze everything in
-            cols_cfg = [1.5, 1.2, 1.2, 0.6, 0.6]
-            
-            h1, h2, h3, h4, h5 = st.columns(cols_cfg)
-            h1.markdown("<div class='tbl-header'>TICKER</div>", unsafe_allow_html=True)
-            h2.markdown("<div class='tbl-header'>TGT</div>", unsafe_allow_html=True)
-            h3.markdown("<div class='tbl-header'>CUR</div>", unsafe_allow_html=True)
-            h4.markdown("<div class='tbl-header'></div>", unsafe_allow_html=True)
-            h5.markdown("<div class='tbl-header'></div>", unsafe_allow_html=True)
-
-            # ROWS
-            for idx, row in active.iterrows():
-                curr = float(row.get('current_price', 0) or 0)
-                tgt = float(row['target_price'])
-                row_col = "#FF4B4B" if curr > tgt else "#00E676"
-                
-                # Top Border
-                st.markdown(f"<div class='row-border' style='background:{row_col}; opacity:0.6;'></div>", unsafe_allow_html=True)
-                
-                c1, c2, c3, c4, c5 = st.columns(cols_cfg)
-                
-                c1.markdown(f"<div class='tbl-cell' style='color:#FFC107; font-weight:900;'>{row['ticker']}</div>", unsafe_allow_html=True)
-                c2.markdown(f"<div class='tbl-cell'>{tgt:.1f}</div>", unsafe_allow_html=True)
-                c3.markdown(f"<div class='tbl-cell' style='color:#aaa;'>{curr:.1f}</div>", unsafe_allow_html=True)
-                
-                with c4:
-                    if st.button("✏️", key=f"e_{idx}"):
-                        st.session_state.edit_ticker = row['ticker']
-                        st.session_state.edit_price = tgt
-                        st.session_state.edit_note = row['notes']
-                        st.session_state.alert_db.drop(idx, inplace=True); st.session_state.alert_db.reset_index(drop=True, inplace=True); sync_db(st.session_state.alert_db); st.rerun()
-                with c5:
-                    if st.button("🗑️", key=f"d_{idx}"):
-                        st.session_state.alert_db.drop(idx, inplace=True); st.session_state.alert_db.reset_index(drop=True, inplace=True); sync_db(st.session_state.alert_db); st.rerun()
+            # Only the visible page goes to the (canvas-rendered) grid
+            p1, p2 = st.columns([1, 1])
+            with p2: page_size = st.selectbox("Rows", PAGE_SIZES, key="page_size", label_visibility="collapsed")
+            pages = page_count(n_active, page_size)
+            with p1: page = st.number_input("Page", 1, pages, min(st.session_state.get("page", 1), pages), key="page", label_visibility="collapsed")
+            grid, _ = active_grid(st.session_state.alert_db.frame(), page, page_size)
+            edited = st.data_editor(
+                grid, key=f"grid_{page}_{page_size}", hide_index=True, use_container_width=True,
+                disabled=["ticker", "current_price", "gap"],
+                column_order=["sel", "ticker", "target_price", "current_price", "gap", "direction", "notes"],
+                column_config={
+                    "sel": st.column_config.CheckboxColumn("", width="small"),
+                    "ticker": st.column_config.TextColumn("TICKER"),
+                    "target_price": st.column_config.NumberColumn("TGT", format="%.2f", min_value=0.0, step=0.1),
+                    "current_price": st.column_config.NumberColumn("CUR", format="%.2f"),
+                    "gap": st.column_config.NumberColumn("GAP", format="%+.1f%%"),
+                    "direction": st.column_config.SelectboxColumn("DIR", options=["Up", "Down"], required=True),
+                    "notes": st.column_config.TextColumn("NOTE"),
+                })
+            selected = edited.index[edited["sel"]].tolist()
+            cols = ["target_price", "direction", "notes"]
+            changed = edited.index[((edited[cols] != grid[cols]) & ~(edited[cols].isna() & grid[cols].isna())).any(axis=1)].tolist()
+            st.caption(f"{n_active} active · page {page}/{pages}")
+
+            b1, b2, b3 = st.columns(3)
+            db = st.session_state.alert_db
+            if b1.button(f"💾 Save ({len(changed)})", disabled=not changed, use_container_width=True):
+                pos = db.positions_of(changed)
+                upd = edited.loc[db.column('alert_id')[pos]]
+                db.update(pos, target_price=upd['target_price'].to_numpy(dtype=float), direction=upd['direction'].to_numpy(), notes=upd['notes'].to_numpy())
+                sync_db(db); st.rerun()
+            if b2.button(f"🗑️ Delete ({len(selected)})", disabled=not selected, use_container_width=True):
+                db.remove(db.positions_of(selected))
+                sync_db(db); st.rerun()
+            if b3.button("✏️ Edit", disabled=len(selected) != 1, use_container_width=True):
+                pos = db.positions_of(selected)
+                row = db.row(pos[0])
+                st.session_state.edit_ticker = row['ticker']
+                st.session_state.edit_price = row['target_price']
+                st.session_state.edit_note = row['notes']
+                db.remove(pos)
+                sync_db(db); st.rerun()
 
         st.markdown("---")
         with st.expander("➕ Add Alert", expanded=True):
@@ -420,8 +404,7 @@ def main():
                     if is_duplicate_alert(t, p, d):
                         st.error("Duplicate!")
                     else:
-                        new = {"ticker": t, "target_price": p, "current_price": 0.0, "direction": d, "notes": n, "created_at": str(datetime.now()), "status": "Active", "triggered_at": ""}
-                        st.session_state.alert_db = pd.concat([st.session_state.alert_db, pd.DataFrame([new])], ignore_index=True)
+                        st.session_state.alert_db.add(t, p, d, n)
                         sync_db(st.session_state.alert_db)
                         st.session_state.edit_ticker = ""; st.session_state.edit_price = 0.0; st.session_state.edit_note = ""
                         st.success("Saved!")
@@ -433,10 +416,8 @@ def main():
         calc_ticker = st.text_input("Stock Ticker", placeholder="Ticker...", key="calc_t").upper()
         current_val = 0.0
         if calc_ticker:
-            try:
-                data = yf.Ticker(calc_ticker).history(period='1d')['Close']
-                if not data.empty: current_val = float(data.iloc[-1])
-            except: pass
+            try: current_val = last_prices([calc_ticker], get_quote_cache()).get(calc_ticker, 0.0)
+            except Exception as e: st.caption(f"⚠️ No quote for {calc_ticker}: {e}")
         max_rng = current_val * 2 if current_val > 0 else 1000.0
         val_default = current_val if current_val > 0 else 0.0
         buy_price = st.slider("Buy Price ($)", min_value=0.0, max_value=max_rng, value=val_default, step=0.1)
@@ -453,20 +434,101 @@ def main():
                 sl_target = round(res['sl_price'], 2)
                 if is_duplicate_alert(tkr, sl_target, "Down"): st.warning("Active!")
                 else:
-                    new = {"ticker": tkr, "target_price": sl_target, "current_price": res['current_price'], "direction": "Down", "notes": f"Smart SL", "created_at": str(datetime.now()), "status": "Active", "triggered_at": ""}
-                    st.session_state.alert_db = pd.concat([st.session_state.alert_db, pd.DataFrame([new])], ignore_index=True)
+                    st.session_state.alert_db.add(tkr, sl_target, "Down", "Smart SL", current_price=res['current_price'])
                     sync_db(st.session_state.alert_db); st.success("Set!"); time.sleep(1); st.rerun()
 
+        st.markdown("---")
+        st.markdown("### 📋 Portfolio SL")
+        portfolio = st.text_area("One per line: TICKER [BUY PRICE]", placeholder="AAPL 180\nMSFT\nNVDA 95", key="calc_portfolio")
+        if st.button("Calculate All", type="primary"):
+            tickers, entries = parse_portfolio(portfolio)
+            if tickers:
+                with st.spinner(f"Analyzing {len(tickers)} tickers..."):
+                    try: st.session_state.calc_table = smart_sl_table(tickers, entries, store=get_history_store())
+                    except Exception as e: st.error(str(e))
+        if 'calc_table' in st.session_state:
+            table = st.session_state.calc_table
+            st.dataframe(table[["ticker", "entry", "current_price", "sl_price", "reason", "trend", "error"]], hide_index=True, use_container_width=True,
+                         column_config={c: st.column_config.NumberColumn(format="%.2f") for c in ["entry", "current_price", "sl_price"]})
+            if st.button(f"🔔 Set {int((table['error'] == '').sum())} Alerts"):
+                added, skipped = add_smart_sl_alerts(table)
+                st.success(f"Set {added}, skipped {skipped} duplicates"); time.sleep(1); st.rerun()
+
     # 3. HISTORY TAB (FULL)
     with tab_hist:
         st.markdown("### 📜 Log")
-        hist_view = st.session_state.alert_db[st.session_state.alert_db['status'] == 'Completed']
+        frame = st.session_state.alert_db.frame()
+        hist_view = frame[frame['status'] == 'Completed']
         if not hist_view.empty:
-            for idx, row in hist_view[::-1].iterrows(): st.info(f"✅ {row['ticker']} - ${float(row['target_price']):.2f} on {row['triggered_at']}")
+            for row in hist_view[::-1].itertuples(): st.info(f"✅ {row.ticker} - ${row.target_price:.2f} on {row.triggered_at}")
             if st.button("🗑️ Clear Log"):
-                st.session_state.alert_db = st.session_state.alert_db[st.session_state.alert_db['status'] == 'Active']
-                sync_db(st.session_state.alert_db); st.rerun()
+                db = st.session_state.alert_db
+                db.remove(np.flatnonzero(db.column('status') != ACTIVE))
+                sync_db(db); st.rerun()
         else: st.caption("Empty.")
 
+    # SETTINGS (contacts come from storage, so after the tabs)
+    with settings:
+        user = st.session_state.user_id
+        if 'user_email' not in st.session_state:
+            # Saved contacts are only shown to a session that entered the partition's PIN
+            contact = (load_contacts() or {}).get(user, {}) if user in st.session_state.unlocked else {}
+            st.session_state.user_email = contact.get("email", "")
+            st.session_state.user_phone = contact.get("phone", "")
+        u1, u2, u3 = st.columns([2, 1, 1])
+        with u1: st.text_input("User", key="temp_user", value=user)
+        with u2: st.text_input("PIN", key="temp_pin", type="password")
+        with u3:
+            if st.button("Switch User"):
+                target = user_key(st.session_state.temp_user)
+                contacts = load_contacts()
+                stored = (contacts or {}).get(target, {}).get("pin", "")
+                if contacts is None: st.error("Users could not be loaded. Try again.")
+                elif stored and not check_pin(stored, st.session_state.temp_pin): st.error(f"Wrong PIN for {target}.")
+                elif target != user or stored:
+                    # Switch partitions: that user's alerts (and, with their PIN, contacts) replace the current ones
+                    contact = contacts.get(target, {}) if stored else {}
+                    if stored: st.session_state.unlocked.add(target)
+                    st.session_state.user_id = target
+                    st.session_state.user_email = contact.get("email", "")
+                    st.session_state.user_phone = contact.get("phone", "")
+                    st.query_params["user"] = target
+                    st.session_state.alert_db = load_data_from_db()
+                    st.rerun()
+        if is_claimed(user) and user not in st.session_state.unlocked:
+            st.caption(f"🔒 {user} is protected by a PIN: enter it above to see their alerts and contacts.")
+        else:
+            # Keyed by user so a switch shows that user's contacts rather than the previous inputs
+            email_key, phone_key = f"temp_email_{user}", f"temp_phone_{user}"
+            c1, c2, c3 = st.columns(3)
+            with c1: st.text_input("Email", key=email_key, value=st.session_state.user_email)
+            with c2: st.text_input("WhatsApp", key=phone_key, value=st.session_state.user_phone)
+            with c3: st.text_input("New PIN", key=f"new_pin_{user}", type="password",
+                                   help="Required to save contacts for a user without a PIN; leave empty to keep the current one.")
+            if st.button("Save Settings", type="primary"):
+                new_pin = st.session_state[f"new_pin_{user}"]
+                if user not in st.session_state.unlocked and len(new_pin) < 4:
+                    st.error("Choose a PIN of at least 4 characters: it protects these contacts and alerts.")
+                elif save_contact(user, st.session_state[email_key], st.session_state[phone_key], hash_pin(new_pin) if new_pin else None):
+                    st.session_state.unlocked.add(user)
+                    st.session_state.user_email = st.session_state[email_key]
+                    st.session_state.user_phone = st.session_state[phone_key]
+                    st.success("Saved!")
+        qs = get_quote_cache().stats()
+        st.caption(f"Quote cache: {qs['size']} cached · {qs['hits']} hits · {qs['misses']} misses · {qs['evictions']} evictions · {qs['coalesced']} coalesced")
+        ns = get_dispatcher().stats()
+        st.caption(f"Notifications: {ns['sent']} sent · {ns['queued']} queued · {ns['retried']} retried · {ns['failed']} failed")
+        stages = {r['stage']: r for r in metrics.summary()['stages']}
+        if 'cycle' in stages:
+            c = stages['cycle']
+            st.caption(f"Cycles: {c['runs']} · p50 {c['p50_s']:.2f}s · p95 {c['p95_s']:.2f}s · {c['errors']} failed · [metrics](?metrics)")
+        if st.toggle("🔄 Auto-Poll (60s)" if POLL_IN_UI else "🔄 Auto-Refresh (60s)"):
+            auto_poll()
+
+    market_dashboard(dashboard)
+
 if __name__ == "__main__":
-    main()
+    get_metrics_server()
+    if "metrics" in st.query_params: metrics_page()
+    else:
+        with metrics.span("render"): main()
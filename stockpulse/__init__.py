@@ -0,0 +1,6 @@
+"""StockPulse core: alert logic that runs with or without the Streamlit UI."""
+
+ALERT_COLUMNS = ["ticker", "target_price", "current_price", "direction", "notes", "created_at", "status", "triggered_at", "alert_id"]
+CONTACT_COLUMNS = ["user_id", "email", "phone", "pin"]
+# Partition of the alerts that existed before per-user partitions (the first worksheet)
+DEFAULT_USER = "default"
@@ -0,0 +1,222 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from stockpulse import ALERT_COLUMNS
+from stockpulse.persistence import new_alert_id
+
+# ==========================================
+# TYPED IN-MEMORY ALERT STORE
+# ==========================================
+# Columns are fixed-dtype NumPy arrays with spare capacity, so adding an
+# alert is an amortized O(1) append. Tickers are interned to int32 codes,
+# status and direction are int8 enums, prices are float64 parsed once at
+# load. Active alerts are counted in a hash index keyed by
+# (ticker code, target, direction) for O(1) duplicate checks.
+# Row labels are positions; they stay stable until the next remove().
+
+STATUSES = ["Active", "Completed"]
+DIRECTIONS = ["Up", "Down"]
+ACTIVE, COMPLETED = 0, 1
+UP, DOWN = 0, 1
+
+_DTYPES = {"ticker": np.int32, "target_price": np.float64, "current_price": np.float64,
+           "direction": np.int8, "status": np.int8,
+           "notes": object, "created_at": object, "triggered_at": object, "alert_id": object}
+
+def _codes(values, labels):
+    """Encode strings against a fixed label list; unknown values get -1."""
+    return pd.Categorical(values, categories=labels).codes.astype(np.int8)
+
+def _decode(codes, labels):
+    table = np.array(labels + [""], dtype=object)
+    return table[np.where(codes < 0, len(labels), codes)]
+
+
+class AlertStore:
+    def __init__(self, capacity=64):
+        self._cols = {c: np.empty(capacity, dtype=t) for c, t in _DTYPES.items()}
+        self._n = 0
+        self.tickers = []         # code -> symbol
+        self._ticker_code = {}    # symbol -> code
+        self._active_index = {}   # (ticker code, target, direction code) -> active count
+        self._frame = None
+        self.version = 0
+        self._trigger_cache = None  # (stores, versions, TriggerEngine), see TriggerEngine.cached
+
+    # ---------- construction ----------
+    @classmethod
+    def from_frame(cls, df):
+        """Parse an alert frame (strings or objects, any column order) once into typed columns."""
+        n = len(df)
+        store = cls(max(64, n))
+        if not n: return store
+        get = lambda c: df[c] if c in df.columns else pd.Series([""] * n, index=df.index)
+        codes, uniques = pd.factorize(get("ticker").astype(str).str.strip().str.upper())
+        store.tickers = list(uniques)
+        store._ticker_code = {t: i for i, t in enumerate(store.tickers)}
+        cols = store._cols
+        cols["ticker"][:n] = codes
+        cols["target_price"][:n] = pd.to_numeric(get("target_price"), errors="coerce").to_numpy(dtype=float)
+        cols["current_price"][:n] = pd.to_numeric(get("current_price"), errors="coerce").fillna(0.0).to_numpy(dtype=float)
+        cols["direction"][:n] = _codes(get("direction"), DIRECTIONS)
+        cols["status"][:n] = _codes(get("status"), STATUSES)
+        for c in ("notes", "created_at", "triggered_at", "alert_id"):
+            cols[c][:n] = get(c).astype(object).where(get(c).notna(), "").astype(str).to_numpy(dtype=object)
+        missing = np.flatnonzero(cols["alert_id"][:n] == "")
+        for i in missing: cols["alert_id"][i] = new_alert_id()
+        store._n = n
+        store._reindex()
+        return store
+
+    def _reindex(self):
+        self._active_index = {}
+        c = self._cols
+        active = np.flatnonzero(c["status"][:self._n] == ACTIVE)
+        for key in zip(c["ticker"][active].tolist(), c["target_price"][active].tolist(), c["direction"][active].tolist()):
+            self._active_index[key] = self._active_index.get(key, 0) + 1
+
+    def _touch(self):
+        self._frame = None
+        self.version += 1
+
+    # ---------- reads ----------
+    def __len__(self):
+        return self._n
+
+    @property
+    def empty(self):
+        return self._n == 0
+
+    def column(self, name):
+        """Live read-only view of one typed column."""
+        view = self._cols[name][:self._n].view()
+        view.flags.writeable = False
+        return view
+
+    def intern(self, ticker):
+        code = self._ticker_code.get(ticker)
+        if code is None:
+            code = self._ticker_code[ticker] = len(self.tickers)
+            self.tickers.append(ticker)
+        return code
+
+    def is_duplicate(self, ticker, target, direction):
+        code = self._ticker_code.get(ticker)
+        if code is None or direction not in DIRECTIONS: return False
+        try: target = float(target)
+        except (TypeError, ValueError): return False
+        return self._active_index.get((code, target, DIRECTIONS.index(direction)), 0) > 0
+
+    def positions(self, status=None):
+        if status is None: return np.arange(self._n)
+        return np.flatnonzero(self._cols["status"][:self._n] == STATUSES.index(status))
+
+    def positions_of(self, alert_ids):
+        return np.flatnonzero(np.isin(self._cols["alert_id"][:self._n], list(alert_ids)))
+
+    def row(self, pos):
+        c = self._cols
+        return {"ticker": self.tickers[c["ticker"][pos]], "target_price": float(c["target_price"][pos]),
+                "current_price": float(c["current_price"][pos]),
+                "direction": _decode(c["direction"][pos:pos + 1], DIRECTIONS)[0],
+                "status": _decode(c["status"][pos:pos + 1], STATUSES)[0],
+                "notes": c["notes"][pos], "created_at": c["created_at"][pos],
+                "triggered_at": c["triggered_at"][pos], "alert_id": c["alert_id"][pos]}
+
+    def frame(self):
+        """Decoded DataFrame view (cached until the next mutation); index labels are store positions."""
+        if self._frame is None:
+            c, n = self._cols, self._n
+            self._frame = pd.DataFrame({
+                "ticker": np.array(self.tickers, dtype=object)[c["ticker"][:n]] if n else np.array([], dtype=object),
+                "target_price": c["target_price"][:n].copy(),
+                "current_price": c["current_price"][:n].copy(),
+                "direction": _decode(c["direction"][:n], DIRECTIONS),
+                "notes": c["notes"][:n].copy(),
+                "created_at": c["created_at"][:n].copy(),
+                "status": _decode(c["status"][:n], STATUSES),
+                "triggered_at": c["triggered_at"][:n].copy(),
+                "alert_id": c["alert_id"][:n].copy(),
+            }, columns=ALERT_COLUMNS)
+        return self._frame
+
+    # ---------- writes ----------
+    def _grow(self, extra):
+        need = self._n + extra
+        cap = len(self._cols["ticker"])
+        if need <= cap: return
+        while cap < need: cap *= 2
+        for name, arr in self._cols.items():
+            grown = np.empty(cap, dtype=arr.dtype)
+            grown[:self._n] = arr[:self._n]
+            self._cols[name] = grown
+
+    def add(self, ticker, target_price, direction, notes="", current_price=0.0, status="Active", created_at=None, triggered_at="", alert_id=None):
+        """Append one alert; returns its position."""
+        self._grow(1)
+        i, c = self._n, self._cols
+        c["ticker"][i] = self.intern(str(ticker).strip().upper())
+        c["target_price"][i] = float(target_price)
+        c["current_price"][i] = float(current_price or 0.0)
+        c["direction"][i] = DIRECTIONS.index(direction) if direction in DIRECTIONS else -1
+        c["status"][i] = STATUSES.index(status) if status in STATUSES else -1
+        c["notes"][i] = str(notes or "")
+        c["created_at"][i] = created_at or str(datetime.now())
+        c["triggered_at"][i] = triggered_at or ""
+        c["alert_id"][i] = alert_id or new_alert_id()
+        self._n += 1
+        if c["status"][i] == ACTIVE:
+            key = (int(c["ticker"][i]), float(c["target_price"][i]), int(c["direction"][i]))
+            self._active_index[key] = self._active_index.get(key, 0) + 1
+        self._touch()
+        return i
+
+    def remove(self, positions):
+        """Drop rows by position (compacts the columns; positions of later rows shift)."""
+        keep = np.ones(self._n, dtype=bool)
+        keep[np.asarray(positions, dtype=int)] = False
+        if keep.all(): return
+        n = int(keep.sum())
+        for name, arr in self._cols.items(): arr[:n] = arr[:self._n][keep]
+        for arr in self._cols.values():
+            if arr.dtype == object: arr[n:self._n] = None  # release strings
+        self._n = n
+        self._reindex(); self._touch()
+
+    def update(self, positions, **values):
+        """Set columns for rows at ``positions``; ``values`` may be scalars or per-row sequences."""
+        positions = np.asarray(positions, dtype=int)
+        if not len(positions): return
+        c = self._cols
+        for name, value in values.items():
+            if name == "ticker": value = [self.intern(str(t).strip().upper()) for t in np.broadcast_to(np.asarray(value, dtype=object), positions.shape)]
+            elif name == "direction": value = _codes(np.broadcast_to(np.asarray(value, dtype=object), positions.shape), DIRECTIONS)
+            elif name == "status": value = _codes(np.broadcast_to(np.asarray(value, dtype=object), positions.shape), STATUSES)
+            c[name][positions] = value
+        self._reindex(); self._touch()
+
+    def apply_snapshot(self, prices, fired, triggered_at):
+        """Bulk-write ``current_price`` for active rows with a quote and complete the ``fired`` positions.
+
+        Returns True when a stored price actually moved, so an unchanged snapshot need not be saved.
+        """
+        c, n = self._cols, self._n
+        px = np.full(len(self.tickers), np.nan)
+        for tkr, price in prices.items():
+            code = self._ticker_code.get(tkr)
+            if code is not None: px[code] = price
+        active = np.flatnonzero(c["status"][:n] == ACTIVE)
+        quoted = px[c["ticker"][active]]
+        with np.errstate(invalid="ignore"): ok = (quoted > 0) & (quoted != c["current_price"][active])
+        c["current_price"][active[ok]] = quoted[ok]
+        fired = np.asarray(fired, dtype=int)
+        if len(fired):
+            for key in zip(c["ticker"][fired].tolist(), c["target_price"][fired].tolist(), c["direction"][fired].tolist()):
+                if self._active_index.get(key, 0) > 1: self._active_index[key] -= 1
+                else: self._active_index.pop(key, None)
+            c["status"][fired] = COMPLETED
+            c["triggered_at"][fired] = triggered_at
+        if ok.any() or len(fired): self._touch()
+        return bool(ok.any())
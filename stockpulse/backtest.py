@@ -0,0 +1,263 @@
+"""Historical replay of alerts and Smart SL stops over stored daily bars.
+
+    python -m stockpulse.backtest                           # every alert of the default user, 5y of bars
+    python -m stockpulse.backtest --user bob --horizon 60   # ... counting only hits within 60 bars
+    python -m stockpulse.backtest --smart-sl "AAPL, TSLA" --every 21
+    python -m stockpulse.backtest --synthetic 10000         # fake market and alerts, offline
+
+An alert is live from the first bar after it was created; it fires on the
+first bar whose high (Up) or low (Down) reaches its target. A Smart SL rule
+is the stop the rule chain in ``smartsl.stop_rules`` would have set at the
+close of its entry bar, replayed as a Down alert from the next bar.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from stockpulse import DEFAULT_USER
+from stockpulse.history import frame_to_bars
+from stockpulse.smartsl import ATR_WINDOW, MA_WINDOW, REASONS, parse_portfolio, rolling_mean, stop_rules, true_range
+
+# Cells of the (bars x alerts) comparison evaluated at once; bounds memory to a few tens of MB
+CHUNK_CELLS = 4_000_000
+_DAY = 10 ** 6  # key stride per ticker column; day numbers are shifted into [0, _DAY)
+
+# ==========================================
+# BAR PANEL
+# ==========================================
+def _key(cols, days):
+    day = np.clip(days.astype(np.int64) + _DAY // 2, 1, _DAY - 1)
+    return cols * _DAY + np.where(np.isnat(days), 0, day)  # NaT sorts before every bar of its column
+
+
+class BarPanel:
+    """Daily bars of many tickers as right-aligned (bars x tickers) arrays, the layout ``smartsl`` uses.
+
+    Column ``j`` holds ticker ``j``'s own bars in its last ``length[j]``
+    rows; rows above are NaN (dates NaT).
+    """
+
+    def __init__(self, bars):
+        self.tickers = list(bars)
+        self.col = {t: j for j, t in enumerate(self.tickers)}
+        self.length = np.array([len(b) for b in bars.values()], dtype=np.int64)
+        n = int(self.length.max()) if len(self.length) else 0
+        self.offset = n - self.length
+        self.dates = np.full((n, len(self.tickers)), np.datetime64("NaT"), dtype="datetime64[D]")
+        self.high, self.low, self.close = (np.full((n, len(self.tickers)), np.nan) for _ in range(3))
+        for j, b in enumerate(bars.values()):
+            rows = slice(int(self.offset[j]), n)
+            self.dates[rows, j] = b["date"]
+            self.high[rows, j], self.low[rows, j], self.close[rows, j] = b["high"], b["low"], b["close"]
+        # (column, day) keys in column-major order are sorted: one searchsorted finds a bar in any column
+        days = np.concatenate([np.asarray(b["date"], dtype="datetime64[D]") for b in bars.values()] or [np.empty(0, "datetime64[D]")])
+        self._keys = _key(np.repeat(np.arange(len(self.tickers), dtype=np.int64), self.length), days)
+        self._first = np.concatenate(([0], np.cumsum(self.length)[:-1])) if len(self.length) else self.length
+
+    @classmethod
+    def from_store(cls, store, tickers, period="5y"):
+        """Bars from a HistoryStore, brought up to date first (one batched download per start date)."""
+        tickers = list(dict.fromkeys(tickers))
+        store.update(tickers, period)
+        return cls({t: np.asarray(store.bars(t)) for t in tickers})
+
+    @classmethod
+    def from_frames(cls, frames):
+        """Bars from ``{ticker: OHLC frame}`` as ``download_history`` returns them."""
+        return cls({t: frame_to_bars(f) for t, f in frames.items()})
+
+    def __len__(self):
+        return len(self.close)
+
+    def columns(self, tickers):
+        """Column of each ticker; -1 where there are no bars."""
+        return np.array([self.col.get(t, -1) for t in tickers], dtype=np.int64)
+
+    def rows_after(self, cols, days):
+        """Row of the first bar strictly after ``days`` (datetime64[D]; NaT = before all bars) in each column."""
+        if not self.tickers: return np.zeros(len(cols), dtype=np.int64)
+        cols = np.maximum(cols, 0)
+        found = np.searchsorted(self._keys, _key(cols, days), side="right")
+        return self.offset[cols] + found - self._first[cols]
+
+    def rows_on(self, cols, days):
+        """Row of the last bar on or before ``days`` in each column; -1 when there is none."""
+        if not self.tickers: return np.full(len(cols), -1, dtype=np.int64)
+        rows = self.rows_after(cols, days) - 1
+        return np.where(rows >= self.offset[np.maximum(cols, 0)], rows, -1)
+
+# ==========================================
+# FIRST-CROSSING KERNEL
+# ==========================================
+def first_crossing(panel, cols, targets, up, starts, horizon=None, intrabar=True, chunk_cells=CHUNK_CELLS):
+    """Row of the first bar at or after ``starts`` where each target is reached; -1 if never.
+
+    One boolean (bars x alerts) comparison per chunk of alerts, sized so a
+    chunk never holds more than ``chunk_cells`` cells. Alerts whose ticker has
+    no bars (``cols == -1``) never fire.
+    """
+    high, low = (panel.high, panel.low) if intrabar else (panel.close, panel.close)
+    first = np.full(len(targets), -1, dtype=np.int64)
+    live = np.flatnonzero((cols >= 0) & (starts < len(panel)))
+    # Neighbouring alerts then start near the same row, so each chunk scans fewer rows
+    live = live[np.argsort(starts[live], kind="stable")]
+    step = max(1, chunk_cells // max(1, len(panel)))
+    for lo in range(0, len(live), step):
+        idx = live[lo:lo + step]
+        top = int(starts[idx].min())
+        end = len(panel) if horizon is None else min(len(panel), int(starts[idx].max()) + horizon)
+        c, tgt, s = cols[idx], targets[idx], starts[idx] - top
+        hit = np.where(up[idx], high[top:end, c] >= tgt, low[top:end, c] <= tgt)
+        rows = np.arange(end - top)[:, None]
+        hit &= rows >= s
+        if horizon is not None: hit &= rows < s + horizon
+        at = hit.argmax(axis=0)
+        first[idx] = np.where(hit[at, np.arange(len(idx))], at + top, -1)
+    return first
+
+
+def _pick(a, rows, cols, ok, fill):
+    """``a[rows, cols]`` where ``ok``, else ``fill``; safe for out-of-range rows and an empty panel."""
+    if not a.size: return np.full(len(rows), fill, dtype=a.dtype)
+    return np.where(ok, a[np.clip(rows, 0, len(a) - 1), np.maximum(cols, 0)], fill)
+
+
+def _outcome(panel, cols, starts, first):
+    hit = first >= 0
+    nat = np.datetime64("NaT")
+    start = _pick(panel.dates, starts, cols, (cols >= 0) & (starts < len(panel)), nat)
+    return {"start": pd.to_datetime(start), "hit": hit, "trigger_date": pd.to_datetime(_pick(panel.dates, first, cols, hit, nat)),
+            "bars": np.where(hit, first - starts, -1), "trigger_close": _pick(panel.close, first, cols, hit, np.nan)}
+
+# ==========================================
+# REPLAYS
+# ==========================================
+def replay_alerts(frame, panel, start=None, horizon=None, intrabar=True, chunk_cells=CHUNK_CELLS):
+    """Replay alert rows (``ALERT_COLUMNS``) over ``panel``; one result row per alert.
+
+    Each alert starts after its ``created_at`` date, or after ``start`` when
+    given. ``horizon`` limits a hit to that many bars after the start.
+    """
+    if start is not None: created = np.full(len(frame), np.datetime64(pd.Timestamp(start).date(), "D"))
+    else: created = pd.to_datetime(frame["created_at"], errors="coerce").to_numpy().astype("datetime64[D]")
+    cols = panel.columns(frame["ticker"].to_numpy())
+    starts = panel.rows_after(cols, created)
+    targets = pd.to_numeric(frame["target_price"], errors="coerce").to_numpy(dtype=float)
+    up = frame["direction"].to_numpy() == "Up"
+    first = first_crossing(panel, cols, targets, up, starts, horizon, intrabar, chunk_cells)
+    out = pd.DataFrame({"alert_id": frame["alert_id"].to_numpy(), "ticker": frame["ticker"].to_numpy(),
+                        "direction": frame["direction"].to_numpy(), "target_price": targets})
+    return out.assign(**_outcome(panel, cols, starts, first))
+
+
+def smart_sl_rules(panel, tickers, entries, entry_dates):
+    """The Smart SL stop each position would have been given at the close of its entry bar.
+
+    ``entries`` are buy prices (0 means "the entry bar's close"); MA150 and
+    ATR are the values as of the entry bar. Positions without enough bars get
+    a NaN stop.
+    """
+    cols = panel.columns(tickers)
+    rows = panel.rows_on(cols, np.asarray(entry_dates, dtype="datetime64[D]"))
+    ok = (cols >= 0) & (rows >= 0)
+    ma150 = rolling_mean(panel.close, MA_WINDOW) if len(panel) >= MA_WINDOW else np.full(panel.close.shape, np.nan)
+    atr = rolling_mean(true_range(panel.high, panel.low, panel.close), ATR_WINDOW) if len(panel) >= ATR_WINDOW else np.full(panel.close.shape, np.nan)
+    current = _pick(panel.close, rows, cols, ok, np.nan)
+    buy = np.asarray(entries, dtype=float)
+    entry = np.where(buy > 0, buy, current)
+    stop, reason = stop_rules(entry, current, _pick(ma150, rows, cols, ok, np.nan), _pick(atr, rows, cols, ok, np.nan))
+    return pd.DataFrame({"ticker": list(tickers), "entry_date": pd.to_datetime(_pick(panel.dates, rows, cols, ok, np.datetime64("NaT"))),
+                         "entry": entry, "sl_price": stop, "reason": np.where(np.isnan(stop), "", REASONS[reason])})
+
+
+def replay_smart_sl(panel, tickers, entries, entry_dates, horizon=None, intrabar=True, chunk_cells=CHUNK_CELLS):
+    """Set each position's Smart SL at entry and replay it as a Down alert; one result row per position."""
+    rules = smart_sl_rules(panel, tickers, entries, entry_dates)
+    cols = panel.columns(rules["ticker"])
+    starts = panel.rows_after(cols, rules["entry_date"].to_numpy().astype("datetime64[D]"))
+    stops = rules["sl_price"].to_numpy()
+    first = first_crossing(panel, np.where(np.isnan(stops), -1, cols), stops, np.zeros(len(rules), dtype=bool), starts, horizon, intrabar, chunk_cells)
+    out = rules.assign(**_outcome(panel, cols, starts, first))
+    return out.assign(stop_return=out["sl_price"] / out["entry"] - 1)
+
+
+def rolling_entries(panel, tickers, every=21, warmup=MA_WINDOW):
+    """``(tickers, entry_dates)`` for a position opened every ``every`` bars of each ticker once MA150 exists."""
+    out_t, out_d = [], []
+    for t in dict.fromkeys(tickers):
+        j = panel.col.get(t)
+        if j is None: continue
+        dates = panel.dates[int(panel.offset[j]) + warmup - 1::every, j]
+        out_t.extend([t] * len(dates)); out_d.append(dates)
+    return out_t, (np.concatenate(out_d) if out_d else np.empty(0, dtype="datetime64[D]"))
+
+
+def hit_rates(results, by="direction"):
+    """Alerts, hits, hit rate and median bars to the hit, overall and per ``by`` group."""
+    def row(g):
+        hits = g["bars"][g["hit"]]
+        return pd.Series({"alerts": len(g), "hits": int(g["hit"].sum()), "hit_rate": float(g["hit"].mean()) if len(g) else 0.0,
+                          "median_bars": float(hits.median()) if len(hits) else np.nan})
+    groups = [row(g).rename(k) for k, g in results.groupby(by, sort=True)] if by else []
+    return pd.DataFrame([row(results).rename("all"), *groups])
+
+# ==========================================
+# CLI
+# ==========================================
+def _print(title, results, by):
+    print(title)
+    print(hit_rates(results, by).to_string(float_format=lambda v: f"{v:,.3f}"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m stockpulse.backtest", description="Replay StockPulse alerts and Smart SL stops over stored bars.")
+    parser.add_argument("--secrets", help="path to secrets.toml (default: .streamlit/secrets.toml)")
+    parser.add_argument("--user", default=DEFAULT_USER, help="alert partition to replay")
+    parser.add_argument("--status", default="", help="only alerts with this status (default: all)")
+    parser.add_argument("--start", help="replay every alert from this date instead of its creation date")
+    parser.add_argument("--period", default="5y", help="history to load (HistoryStore period, default 5y)")
+    parser.add_argument("--horizon", type=int, help="count a hit only within this many bars of the start")
+    parser.add_argument("--close-only", action="store_true", help="trigger on closes instead of intraday highs and lows")
+    parser.add_argument("--smart-sl", metavar="TICKERS", help="replay Smart SL stops for 'AAPL, TSLA, ...' instead of alerts")
+    parser.add_argument("--every", type=int, default=21, help="with --smart-sl: open a position at the close every N bars")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="replay N synthetic alerts over a fake market (no network)")
+    parser.add_argument("--out", help="write the per-alert results to this CSV")
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        from stockpulse.fakes import FakeMarket, synthetic_alerts
+        market = FakeMarket(days=1260)
+        frame = synthetic_alerts(args.synthetic, market)
+        def load(tickers): return BarPanel.from_frames(market.download_history(tickers, period="max"))
+        start = args.start or str(market.index[-260].date())
+    else:
+        from stockpulse.config import load_settings, storage_options
+        from stockpulse.history import HistoryStore
+        from stockpulse.storage import make_backend
+        settings = load_settings(args.secrets)
+        history = HistoryStore(settings.get("HISTORY_DIR", "history"))
+        def load(tickers): return BarPanel.from_store(history, tickers, args.period)
+        frame, start = None, args.start
+        if not args.smart_sl: frame = make_backend(**storage_options(settings)).load(args.user)[0].frame()
+
+    t0 = time.perf_counter()
+    if args.smart_sl:
+        tickers, _ = parse_portfolio(args.smart_sl.replace(",", "\n"))
+        panel = load(tickers)
+        names, dates = rolling_entries(panel, tickers, args.every)
+        results = replay_smart_sl(panel, names, np.zeros(len(names)), dates, args.horizon, not args.close_only)
+        _print(f"{len(results):,} Smart SL positions over {len(panel):,} bars in {time.perf_counter() - t0:.2f}s", results, "reason")
+    else:
+        if args.status: frame = frame[frame["status"] == args.status]
+        panel = load(list(dict.fromkeys(frame["ticker"])))
+        results = replay_alerts(frame, panel, start, args.horizon, not args.close_only)
+        _print(f"{len(results):,} alerts over {len(panel):,} bars of {len(panel.tickers):,} tickers in {time.perf_counter() - t0:.2f}s", results, "direction")
+    if args.out: results.to_csv(args.out, index=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
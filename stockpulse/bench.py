@@ -0,0 +1,287 @@
+"""Offline benchmarks for the hot paths, run against the fakes in stockpulse.fakes.
+
+    python -m stockpulse.bench                                  # every case, 100 .. 1,000,000 rows
+    python -m stockpulse.bench --sizes 100,10000 --cases sync_db,render_active
+    python -m stockpulse.bench --compare bench_results/<earlier run>.json
+
+Each run is saved as JSON under ``bench_results/`` (named by time and git
+revision); ``--compare`` prints the p50 ratio against an earlier run and
+exits non-zero when a case got slower than ``--threshold``.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from stockpulse.alerts import AlertStore
+from stockpulse.backtest import BarPanel, replay_alerts
+from stockpulse.cycle import run_cycle, run_partitions
+from stockpulse.fakes import FakeMarket, FakeMessaging, FakeWorksheet, synthetic_alerts
+from stockpulse.history import HistoryStore
+from stockpulse.notify import NotificationDispatcher, SmtpSession, WhatsAppSender, make_trigger
+from stockpulse.quotes import QuoteCache
+from stockpulse.smartsl import smart_sl_table
+from stockpulse.storage import SheetsBackend
+from stockpulse.views import active_grid
+
+SIZES = [100, 1_000, 10_000, 100_000, 1_000_000]
+RESULTS_DIR = "bench_results"
+
+# ==========================================
+# MEASUREMENT
+# ==========================================
+def measure(setup, op, extra, repeat):
+    """Time ``op(state)`` on a fresh ``setup()`` ``repeat`` times, then once more under tracemalloc.
+
+    Setup is never timed. Returns ``(seconds per run, peak bytes allocated by op, extra(state) of the last timed run)``.
+    """
+    times = []
+    for _ in range(repeat):
+        state = setup()
+        t0 = time.perf_counter()
+        op(state)
+        times.append(time.perf_counter() - t0)
+        counts = extra(state)
+    traced = setup()
+    tracemalloc.start()
+    try:
+        op(traced)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return times, peak, counts
+
+
+class Fixture:
+    """Everything one database size needs, built once and shared by the cases."""
+
+    def __init__(self, rows, market):
+        self.rows = rows
+        self.market = market
+        self.df = synthetic_alerts(rows, market)
+        self._store = None
+
+    def store(self):
+        """A fresh AlertStore (for cases that mutate it)."""
+        return AlertStore.from_frame(self.df)
+
+    def shared_store(self):
+        if self._store is None: self._store = self.store()
+        return self._store
+
+
+# ==========================================
+# CASES
+# ==========================================
+# Each case returns (setup, op, ops, extra(state) -> dict); `ops` is what one run
+# processes, for the throughput column.
+
+def case_check_alerts(fx, ctx):
+    """Fetch -> evaluate -> notify -> flush for every active alert (the poll cycle)."""
+    outbox = FakeMessaging()
+    dispatcher = NotificationDispatcher(SmtpSession("bench@example.com", "x", factory=outbox.smtp),
+                                        WhatsAppSender("sid", "token", "+10000000000", client=outbox))
+    ctx.append(dispatcher.close)
+
+    def notify(row, price):
+        trigger = make_trigger(row, price)
+        dispatcher.enqueue("email", "user@example.com", trigger)
+        dispatcher.enqueue("whatsapp", "+972500000000", trigger)
+
+    def setup():
+        return {"store": fx.store(), "cache": QuoteCache(ttl=3600), "sent": outbox.bytes_sent}
+
+    def op(s):
+        s["fired"], _ = run_cycle(s["store"], s["cache"], notify, fetch=fx.market.download_history)
+        dispatcher.flush()
+        dispatcher.join()
+
+    def extra(s):
+        return {"fired": len(s["fired"]), "bytes_written": outbox.bytes_sent - s["sent"], **outbox.stats()}
+    return setup, op, len(fx.shared_store().positions("Active")), extra
+
+
+def case_check_partitions(fx, ctx):
+    """The same alerts split across one user per 100 rows (up to 1000): one fetch, fanned out to every partition."""
+    users = min(max(fx.rows // 100, 1), 1000)
+    parts = [fx.df.iloc[i::users] for i in range(users)]
+    def setup(): return {"stores": {f"u{i}": AlertStore.from_frame(df) for i, df in enumerate(parts)}, "cache": QuoteCache(ttl=3600)}
+    def op(s): s["results"] = run_partitions(s["stores"], s["cache"], fetch=fx.market.download_history)
+    def extra(s): return {"users": users, "fired": sum(len(f) for f, _ in s["results"].values()), "bytes_written": 0}
+    return setup, op, len(fx.shared_store().positions("Active")), extra
+
+
+def case_sync_db(fx, ctx):
+    """Persist one poll cycle's changes to the sheet (diff + batched writes)."""
+    def setup():
+        backend = SheetsBackend({}, "", worksheet=FakeWorksheet.from_frame(fx.df))
+        store, mirror = backend.load()
+        run_cycle(store, QuoteCache(ttl=3600), fetch=fx.market.download_history)
+        return {"backend": backend, "store": store, "mirror": mirror}
+
+    def op(s):
+        s["changes"] = s["backend"].save(s["store"], s["mirror"])
+
+    def extra(s):
+        sheet = s["backend"].worksheet().stats()
+        return {"bytes_written": sheet["bytes_written"], "cells_written": sheet["cells_written"], "requests": sheet["requests"] - 1}
+    return setup, op, fx.rows, extra
+
+
+def case_load_db(fx, ctx):
+    """Read the whole sheet into an AlertStore and its mirror."""
+    sheet = FakeWorksheet.from_frame(fx.df)
+    def setup(): return {"backend": SheetsBackend({}, "", worksheet=sheet)}
+    def op(s): s["loaded"] = s["backend"].load()
+    def extra(s): return {"bytes_written": 0, "bytes_read": sheet.bytes_read // max(1, sheet.requests)}
+    return setup, op, fx.rows, extra
+
+
+LOOKUPS = 10_000
+
+def case_is_duplicate_alert(fx, ctx):
+    """Duplicate checks against the active index; half the probes exist."""
+    store = fx.shared_store()
+    rng = np.random.default_rng(1)
+    rows = fx.df.iloc[rng.integers(0, fx.rows, LOOKUPS)]
+    probes = list(zip(rows["ticker"], rows["target_price"] + np.where(rng.random(LOOKUPS) < 0.5, 0.0, 0.01), rows["direction"]))
+    def setup(): return {}
+    def op(s): s["dupes"] = sum(store.is_duplicate(t, p, d) for t, p, d in probes)
+    def extra(s): return {"dupes": s["dupes"], "bytes_written": 0}
+    return setup, op, LOOKUPS, extra
+
+
+def case_calculate_smart_sl(fx, ctx):
+    """Smart SL for every distinct ticker, bars from a warm local history store."""
+    tickers = list(dict.fromkeys(fx.df["ticker"]))
+    tmp = tempfile.TemporaryDirectory()
+    ctx.append(tmp.cleanup)
+    history = HistoryStore(tmp.name, max_age=3600, downloader=fx.market.download_history)
+    history.update(tickers, "1y")
+    entries = [0.0] * len(tickers)
+    def setup(): return {}
+    def op(s): s["table"] = smart_sl_table(tickers, entries, store=history)
+    def extra(s): return {"errors": int((s["table"]["error"] != "").sum()), "bytes_written": 0}
+    return setup, op, len(tickers), extra
+
+
+def case_render_active(fx, ctx):
+    """Rebuild the alert frame after a change and build the first page of the Active grid."""
+    store = fx.shared_store()
+    def setup():
+        store._touch()  # every mutation drops the cached frame
+        return {}
+    def op(s): s["grid"], s["active"] = active_grid(store.frame(), 1, 50)
+    def extra(s): return {"active": s["active"], "bytes_written": 0}
+    return setup, op, fx.rows, extra
+
+
+def case_backtest(fx, ctx):
+    """Replay every alert over the market's full daily history (first crossing per alert)."""
+    panel = BarPanel.from_frames(fx.market.download_history(list(dict.fromkeys(fx.df["ticker"])), period="max"))
+    start = str(fx.market.index[0].date())
+    def setup(): return {}
+    def op(s): s["results"] = replay_alerts(fx.df, panel, start)
+    def extra(s): return {"hits": int(s["results"]["hit"].sum()), "bars": len(panel), "bytes_written": 0}
+    return setup, op, fx.rows, extra
+
+
+CASES = {name[5:]: fn for name, fn in globals().items() if name.startswith("case_")}
+
+# ==========================================
+# RUN / SAVE / COMPARE
+# ==========================================
+def git_revision():
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip()
+        return rev + ("-dirty" if dirty else "")
+    except Exception:
+        return "unknown"
+
+
+def run(sizes, cases, repeat=3, seed=0, log=print):
+    market = FakeMarket(seed=seed)
+    results = []
+    for rows in sizes:
+        fx = Fixture(rows, market)
+        for name in cases:
+            ctx = []
+            try:
+                setup, op, ops, extra = CASES[name](fx, ctx)
+                times, peak, counts = measure(setup, op, extra, repeat)
+            finally:
+                for close in ctx: close()
+            p50 = float(np.median(times))
+            result = {"case": name, "rows": rows, "ops": ops, "repeat": repeat,
+                      "p50_s": p50, "min_s": min(times), "max_s": max(times), "mean_s": float(np.mean(times)),
+                      "throughput": ops / p50 if p50 else None, "peak_bytes": peak, **counts}
+            results.append(result)
+            log(f"{name:<20} {rows:>9,} rows  p50 {p50 * 1e3:>10.2f} ms  {result['throughput'] or 0:>14,.0f} ops/s  "
+                f"peak {peak / 2**20:>8.1f} MiB  wrote {result['bytes_written']:>12,} B")
+    return results
+
+
+def save(results, directory=RESULTS_DIR, meta=None):
+    os.makedirs(directory, exist_ok=True)
+    meta = {"revision": git_revision(), "time": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+            "machine": platform.machine(), **(meta or {})}
+    path = os.path.join(directory, f"{datetime.now():%Y%m%d-%H%M%S}-{meta['revision']}.json")
+    with open(path, "w") as f: json.dump({"meta": meta, "results": results}, f, indent=1)
+    return path
+
+
+def compare(results, baseline, threshold=0.2, log=print):
+    """Print the p50 ratio per (case, rows) found in both runs; return the regressions beyond ``threshold``."""
+    before = {(r["case"], r["rows"]): r for r in baseline["results"]}
+    log(f"vs {baseline['meta'].get('revision')} ({baseline['meta'].get('time')})")
+    regressions = []
+    for r in results:
+        old = before.get((r["case"], r["rows"]))
+        if old is None or not old["p50_s"]: continue
+        ratio = r["p50_s"] / old["p50_s"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append((r["case"], r["rows"], ratio))
+        log(f"{r['case']:<20} {r['rows']:>9,} rows  {ratio:>6.2f}x time  "
+            f"{r['peak_bytes'] / max(1, old['peak_bytes']):>6.2f}x peak  {r['bytes_written'] - old['bytes_written']:>+12,} B{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark StockPulse hot paths offline")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="comma-separated alert counts")
+    parser.add_argument("--cases", default=",".join(CASES), help=f"comma-separated subset of: {', '.join(CASES)}")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case and size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=RESULTS_DIR, help="directory for the JSON result file ('' to skip saving)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p50 slowdown that counts as a regression")
+    args = parser.parse_args(argv)
+
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = [c for c in cases if c not in CASES]
+    if unknown: parser.error(f"unknown case(s): {', '.join(unknown)}")
+    sizes = [int(s.replace("_", "")) for s in args.sizes.split(",") if s.strip()]
+
+    results = run(sizes, cases, repeat=args.repeat, seed=args.seed)
+    if args.out: print(f"saved {save(results, args.out, {'seed': args.seed})}")
+    if args.compare:
+        with open(args.compare) as f: baseline = json.load(f)
+        if compare(results, baseline, args.threshold): return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,31 @@
+import os
+import tomllib
+
+# ==========================================
+# SETTINGS OUTSIDE STREAMLIT
+# ==========================================
+# Headless entry points read the same secrets.toml the app uses; any key can
+# be overridden by an environment variable of the same name.
+
+DEFAULT_SHEET_ID = "18GROVu8c2Hx5n4H2FiZrOeLXgH9xJG0miPqfgdb-V9w"
+DEFAULT_MARKET_SYMBOLS = {'S&P 500': '^GSPC', 'Nasdaq': '^IXIC', 'VIX': '^VIX', 'Bitcoin': 'BTC-USD'}
+
+ENV_KEYS = ["SENDER_EMAIL", "SENDER_PASSWORD", "TWILIO_ACCOUNT_SID", "TWILIO_AUTH_TOKEN", "TWILIO_PHONE_NUMBER",
+            "STORAGE_BACKEND", "SQLITE_PATH", "SHEET_ID", "QUOTE_TTL", "POLL_INTERVAL", "POLL_JITTER",
+            "ALERT_EMAIL", "ALERT_PHONE", "INBOUND_PORT", "INBOUND_URL", "INBOUND_SEEN_PATH", "METRICS_PORT"]
+
+def load_settings(path=None):
+    path = path or os.environ.get("STOCKPULSE_SECRETS", os.path.join(".streamlit", "secrets.toml"))
+    settings = {}
+    if os.path.exists(path):
+        with open(path, "rb") as f: settings = tomllib.load(f)
+    for key in ENV_KEYS:
+        if key in os.environ: settings[key] = os.environ[key]
+    return settings
+
+def storage_options(settings):
+    """Keyword arguments for ``storage.make_backend`` from a settings mapping."""
+    return {"kind": settings.get("STORAGE_BACKEND", "sheets"),
+            "credentials": settings.get("gcp_service_account", {}),
+            "sheet_id": settings.get("SHEET_ID", DEFAULT_SHEET_ID),
+            "path": settings.get("SQLITE_PATH", "stockpulse.db")}
@@ -0,0 +1,72 @@
+import time
+from datetime import datetime
+
+import numpy as np
+
+from stockpulse import metrics
+from stockpulse.quotes import last_prices
+from stockpulse.triggers import TriggerEngine
+
+# ==========================================
+# ONE POLL CYCLE: FETCH -> EVALUATE -> NOTIFY
+# ==========================================
+def run_cycle(store, cache, notify=None, fetch=None):
+    """Price every active alert in the AlertStore and complete the crossed ones in place.
+
+    ``notify(row, price)`` is called once per fired alert before the store is
+    updated. Returns ``(fired_positions, changed)``; ``changed`` is True when
+    a price moved or an alert fired, i.e. when the store needs saving. Fetch
+    errors propagate to the caller; ``fetch`` replaces the yfinance download
+    (see :func:`recent_history`).
+    """
+    relay = (lambda _, row, price: notify(row, price)) if notify is not None else None
+    return run_partitions({None: store}, cache, relay, fetch)[None]
+
+
+def run_partitions(stores, cache, notify=None, fetch=None):
+    """One cycle over many users' stores: each distinct ticker is fetched and evaluated once, and fans out to every partition.
+
+    ``stores`` maps a partition key to its AlertStore; ``notify(key, row, price)``
+    is called per fired alert. Returns ``{key: (fired_positions, changed)}``.
+    One engine holds every partition's alerts, so the cost follows distinct
+    tickers plus fired alerts, not users x tickers.
+    """
+    results = {key: ([], False) for key in stores}
+    started = time.perf_counter()
+    # Sorted books survive between cycles; only a change to a store rebuilds them
+    engine = TriggerEngine.cached(stores)
+    tickers = engine.tickers
+    if not tickers: return results
+    active = len(engine)
+    evaluated = time.perf_counter() - started
+    with metrics.span("fetch"): prices = last_prices(tickers, cache, fetch=fetch)
+
+    t0 = time.perf_counter()
+    fired = engine.partition(engine.evaluate(prices))
+    evaluated += time.perf_counter() - t0
+    if notify is not None and fired:
+        # Only hands triggers over; delivery is timed as the "notify" stage where it happens (the dispatcher)
+        for key, hits in fired.items():
+            for pos in hits:
+                row = stores[key].row(pos)
+                notify(key, row, prices[row['ticker']])
+    t0 = time.perf_counter()
+    now = str(datetime.now())
+    for key, store in stores.items():
+        hits = fired.get(key, [])
+        mine = {t: prices[t] for t in store.tickers if t in prices}
+        priced = store.apply_snapshot(mine, hits, now) if mine or len(hits) else False
+        results[key] = (hits, priced or bool(len(hits)))
+    # The fired alerts are Completed now: drop them from the books so the cached engine stays valid
+    for key, hits in fired.items():
+        store, offset = stores[key], engine.offset(key)
+        codes = store.column("ticker")[hits]
+        for code in np.unique(codes): engine.discard(hits[codes == code] + offset, store.tickers[code])
+    engine.remember(stores)
+    metrics.record("evaluate", evaluated + time.perf_counter() - t0)
+    metrics.count("alerts_evaluated", active)
+    metrics.count("alerts_fired", sum(len(h) for h in fired.values()))
+    metrics.gauge("alerts_evaluated_per_second", active / max(time.perf_counter() - started, 1e-9))
+    metrics.gauge("partitions", len(stores))
+    metrics.gauge("distinct_tickers", len(tickers))
+    return results
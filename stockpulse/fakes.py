@@ -0,0 +1,228 @@
+"""Deterministic offline stand-ins for yfinance, gspread and SMTP/Twilio.
+
+Each fake implements just the calls StockPulse makes and counts what goes
+through it, so the hot paths can be run and measured without a network.
+"""
+import threading
+import time
+import zlib
+from datetime import date
+
+import gspread
+import numpy as np
+import pandas as pd
+from gspread.utils import a1_to_rowcol
+
+from stockpulse import ALERT_COLUMNS
+from stockpulse.history import PERIOD_DAYS
+
+# ==========================================
+# MARKET (yfinance)
+# ==========================================
+class FakeMarket:
+    """Every symbol is a seeded random walk of daily bars ending today; drop-in for ``download_history``."""
+
+    def __init__(self, seed=0, days=800, end=None, latency=0.0):
+        self.seed = seed
+        self.index = pd.bdate_range(end=pd.Timestamp(end or date.today()), periods=days)
+        self.latency = latency
+        self._frames = {}
+        self._lock = threading.Lock()
+        self.calls = self.symbols_served = 0
+
+    def frame(self, symbol):
+        """Full OHLCV history of ``symbol``; the same symbol and seed always give the same bars."""
+        frame = self._frames.get(symbol)
+        if frame is not None: return frame
+        rng = np.random.default_rng([zlib.crc32(symbol.encode()), self.seed])
+        close = (20 + zlib.crc32(symbol.encode()) % 480) * np.exp(np.cumsum(rng.normal(0, 0.015, len(self.index))))
+        spread = close * rng.uniform(0.002, 0.03, len(close))
+        frame = pd.DataFrame({"Open": close + rng.uniform(-0.5, 0.5, len(close)) * spread,
+                              "High": close + spread, "Low": close - spread, "Close": close,
+                              "Volume": rng.integers(10_000, 5_000_000, len(close)).astype(float)}, index=self.index)
+        with self._lock: self._frames.setdefault(symbol, frame)
+        return self._frames[symbol]
+
+    def price(self, symbol, back=0):
+        return float(self.frame(symbol)["Close"].iloc[-1 - back])
+
+    def download_history(self, symbols, period="5d", interval="1d", max_workers=8, start=None):
+        with self._lock:
+            self.calls += 1
+            self.symbols_served += len(symbols)
+        if self.latency: time.sleep(self.latency)
+        out = {}
+        for sym in symbols:
+            frame = self.frame(sym)
+            if start is not None: out[sym] = frame[frame.index >= pd.Timestamp(start)]
+            elif period in PERIOD_DAYS: out[sym] = frame[frame.index > frame.index[-1] - pd.Timedelta(days=PERIOD_DAYS[period])]
+            elif period.endswith("d"): out[sym] = frame.iloc[-int(period[:-1]):]
+            else: out[sym] = frame
+        return out
+
+
+# ==========================================
+# SHEET (gspread worksheet)
+# ==========================================
+def _payload(values):
+    return sum(len(str(v).encode()) for row in values for v in row)
+
+
+class FakeSpreadsheet:
+    """Worksheets by title; routes the batched row deletes to the sheet they name."""
+
+    def __init__(self):
+        self.sheets = []
+
+    @property
+    def sheet1(self):
+        return self.sheets[0] if self.sheets else self.add_worksheet("Sheet1")
+
+    def worksheets(self):
+        return list(self.sheets)
+
+    def worksheet(self, title):
+        for ws in self.sheets:
+            if ws.title == title: return ws
+        raise gspread.WorksheetNotFound(title)
+
+    def add_worksheet(self, title, rows=100, cols=26):
+        return FakeWorksheet(title=title, spreadsheet=self)
+
+    def batch_update(self, body):
+        for ws in {self.sheets[r["deleteDimension"]["range"]["sheetId"]] for r in body["requests"]}: ws.requests += 1
+        for req in body["requests"]:
+            rng = req["deleteDimension"]["range"]
+            ws = self.sheets[rng["sheetId"]]
+            del ws.values[rng["startIndex"]:rng["endIndex"]]
+            ws.rows_deleted += rng["endIndex"] - rng["startIndex"]
+
+
+class FakeWorksheet:
+    """In-memory worksheet: a list of string rows, header first. Counts requests and cell bytes in and out."""
+
+    def __init__(self, values=None, title="Sheet1", spreadsheet=None):
+        self.values = [list(map(str, row)) for row in values or []]
+        self.title = title
+        self.spreadsheet = spreadsheet or FakeSpreadsheet()
+        self.id = len(self.spreadsheet.sheets)
+        self.spreadsheet.sheets.append(self)
+        self.requests = self.cells_written = self.bytes_written = self.bytes_read = self.rows_deleted = 0
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls([list(df.columns)] + df.astype(str).to_numpy().tolist())
+
+    def get_all_values(self):
+        self.requests += 1
+        self.bytes_read += _payload(self.values)
+        return [row[:] for row in self.values]
+
+    def col_values(self, col):
+        self.requests += 1
+        values = [row[col - 1] if len(row) >= col else "" for row in self.values]
+        while values and not values[-1]: values.pop()  # gspread drops trailing blanks
+        self.bytes_read += _payload([values])
+        return values
+
+    def batch_update(self, ranges, value_input_option="RAW"):
+        self.requests += 1
+        for item in ranges:
+            row, col = a1_to_rowcol(item["range"].split(":")[0])
+            for r, cells in enumerate(item["values"], start=row - 1):
+                while len(self.values) <= r: self.values.append([])
+                line = self.values[r]
+                if len(line) < col - 1 + len(cells): line.extend([""] * (col - 1 + len(cells) - len(line)))
+                line[col - 1:col - 1 + len(cells)] = map(str, cells)
+            self._count(item["values"])
+
+    def append_rows(self, rows, value_input_option="RAW"):
+        self.requests += 1
+        self.values.extend(list(map(str, row)) for row in rows)
+        self._count(rows)
+
+    def _count(self, values):
+        self.cells_written += sum(len(row) for row in values)
+        self.bytes_written += _payload(values)
+
+    def stats(self):
+        return {"rows": max(0, len(self.values) - 1), "requests": self.requests, "cells_written": self.cells_written,
+                "bytes_written": self.bytes_written, "bytes_read": self.bytes_read, "rows_deleted": self.rows_deleted}
+
+
+# ==========================================
+# MESSAGING (smtplib.SMTP, twilio Client)
+# ==========================================
+class FakeMessaging:
+    """Outbox shared by a fake SMTP factory and a fake Twilio client; keeps counts, not messages."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self._lock = threading.Lock()
+        self.emails = self.whatsapps = self.bytes_sent = self.connections = 0
+        self.messages = self  # twilio: client.messages.create(...)
+
+    def _sent(self, kind, payload):
+        if self.latency: time.sleep(self.latency)
+        with self._lock:
+            setattr(self, kind, getattr(self, kind) + 1)
+            self.bytes_sent += len(payload.encode())
+
+    # twilio.rest.Client
+    def create(self, from_, body, to):
+        self._sent("whatsapps", body)
+
+    # smtplib.SMTP(server, port)
+    def smtp(self, server, port):
+        with self._lock: self.connections += 1
+        return _FakeSMTP(self)
+
+    def stats(self):
+        return {"emails": self.emails, "whatsapps": self.whatsapps, "bytes_sent": self.bytes_sent, "connections": self.connections}
+
+
+class _FakeSMTP:
+    def __init__(self, outbox):
+        self.outbox = outbox
+
+    def starttls(self): pass
+    def login(self, user, password): pass
+    def noop(self): return (250, b"OK")
+    def quit(self): pass
+
+    def sendmail(self, sender, to, msg):
+        self.outbox._sent("emails", msg)
+
+
+# ==========================================
+# SYNTHETIC ALERT DATABASE
+# ==========================================
+def synthetic_alerts(n, market, tickers=None, fire_rate=0.01, active_rate=0.9, seed=0):
+    """``n`` alert rows over ``tickers`` (default: one per 20 rows, 10..5000 symbols) as the sheet would hold them.
+
+    Targets sit 1-20% away from each symbol's last close on the side that does
+    not trigger, except a ``fire_rate`` share of active alerts that have
+    already been crossed. ``current_price`` is the previous close.
+    """
+    rng = np.random.default_rng(seed)
+    if tickers is None: tickers = [f"S{i:04d}" for i in range(min(max(n // 20, 10), 5000))]
+    last = np.array([market.price(t) for t in tickers])
+    prev = np.array([market.price(t, back=1) for t in tickers])
+    pick = rng.integers(0, len(tickers), n)
+    up = rng.random(n) < 0.5
+    active = rng.random(n) < active_rate
+    fire = active & (rng.random(n) < fire_rate)
+    side = np.where(up, 1.0, -1.0) * np.where(fire, -1.0, 1.0)
+    target = np.round(last[pick] * (1 + side * rng.uniform(0.01, 0.2, n)), 2)
+    df = pd.DataFrame({
+        "ticker": np.asarray(tickers, dtype=object)[pick],
+        "target_price": target,
+        "current_price": np.round(prev[pick], 2),
+        "direction": np.where(up, "Up", "Down"),
+        "notes": "bench",
+        "created_at": "2026-01-01 09:30",
+        "status": np.where(active, "Active", "Completed"),
+        "triggered_at": np.where(active, "", "2026-01-02 16:00"),
+        "alert_id": [f"{i:012x}" for i in range(n)],
+    })
+    return df[ALERT_COLUMNS]
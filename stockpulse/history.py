@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from stockpulse.quotes import download_history
+
+# ==========================================
+# LOCAL OHLCV HISTORY STORE
+# ==========================================
+# One memory-mapped .npy file of daily bars per ticker. A request only
+# downloads the bars from the last stored final bar on (the newest stored bar
+# may have been an intraday snapshot), and not at all while the file is
+# younger than `max_age` seconds. yfinance adjusts the whole series for splits
+# and dividends, so when the re-fetched final bar no longer matches what is
+# stored the ticker's file is thrown away and downloaded again in full.
+
+BAR = np.dtype([("date", "datetime64[D]"), ("open", "f8"), ("high", "f8"), ("low", "f8"), ("close", "f8"), ("volume", "f8")])
+ADJUST_TOLERANCE = 1e-4  # relative close difference on the overlapping bar that means "re-adjusted"
+FIELDS = {"Open": "open", "High": "high", "Low": "low", "Close": "close", "Volume": "volume"}
+PERIOD_DAYS = {"1mo": 31, "3mo": 92, "6mo": 183, "1y": 366, "2y": 731, "5y": 1827, "10y": 3653}
+
+def period_start(period, today=None):
+    today = today or date.today()
+    if period == "max": return None
+    return today - timedelta(days=PERIOD_DAYS[period])
+
+def frame_to_bars(frame):
+    if frame is None or frame.empty: return np.empty(0, dtype=BAR)
+    idx = frame.index
+    if getattr(idx, "tz", None) is not None: idx = idx.tz_localize(None)
+    bars = np.empty(len(frame), dtype=BAR)
+    bars["date"] = idx.normalize().to_numpy().astype("datetime64[D]")
+    for col, field in FIELDS.items():
+        bars[field] = frame[col].to_numpy(dtype=float) if col in frame else np.nan
+    bars = bars[~np.isnan(bars["close"])]
+    _, last = np.unique(bars["date"][::-1], return_index=True)  # keep the last bar of any duplicate date
+    return bars[::-1][last]
+
+def bars_to_frame(bars):
+    frame = pd.DataFrame({col: bars[field] for col, field in FIELDS.items()}, index=pd.DatetimeIndex(bars["date"].astype("datetime64[ns]"), name="Date"))
+    return frame
+
+
+class HistoryStore:
+    def __init__(self, root="history", max_age=900.0, downloader=download_history, clock=time.time):
+        self.root = root
+        self.max_age = max_age
+        self.downloader = downloader
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.fetched_bars = self.fetch_requests = self.rebuilt = 0
+        self._full_from = {}  # ticker -> earliest start a full download was asked for (a recent listing has no older bars)
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, ticker):
+        return os.path.join(self.root, ticker.replace("/", "_").replace("^", "_IDX_") + ".npy")
+
+    def bars(self, ticker):
+        path = self._path(ticker)
+        if not os.path.exists(path): return np.empty(0, dtype=BAR)
+        return np.load(path, mmap_mode="r")
+
+    def _write(self, ticker, bars):
+        path = self._path(ticker)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f: np.save(f, np.ascontiguousarray(bars, dtype=BAR))
+        os.replace(tmp, path)  # readers never see a half-written file
+
+    def _stale(self, ticker):
+        path = self._path(ticker)
+        return not os.path.exists(path) or self.clock() - os.path.getmtime(path) > self.max_age
+
+    def update(self, tickers, period="1y"):
+        """Bring the stored bars of ``tickers`` up to date; one batched download per distinct start date."""
+        with self._lock:
+            groups = {}
+            wanted = period_start(period)
+            for tkr in dict.fromkeys(tickers):
+                stored = self.bars(tkr)
+                # A longer period than what is stored: refetch the whole span once, fresh or not
+                short = (len(stored) > 0 and wanted is not None and stored["date"][0].astype(object) > wanted + timedelta(days=7)
+                         and self._full_from.get(tkr, date.max) > wanted)
+                if not short and not self._stale(tkr): continue
+                start = stored["date"][-2].astype(object) if len(stored) > 1 and not short else None
+                groups.setdefault(start, []).append(tkr)
+            rebuild = []
+            for start, group in groups.items():
+                self.fetch_requests += 1
+                frames = self.downloader(group, period=period, start=start) if start else self.downloader(group, period=period)
+                for tkr in group:
+                    if start is None: self._full_from[tkr] = min(self._full_from.get(tkr, date.max), wanted or date.min)
+                    new = frame_to_bars(frames.get(tkr))
+                    stored = np.asarray(self.bars(tkr))
+                    if start is not None and self._adjusted(stored[-2], new):
+                        rebuild.append(tkr)
+                        continue
+                    if len(new):
+                        self.fetched_bars += len(new)
+                        self._write(tkr, np.concatenate((stored[stored["date"] < new["date"][0]], new)))
+                    elif os.path.exists(self._path(tkr)):
+                        os.utime(self._path(tkr))  # nothing new: mark the ticker fresh
+            if rebuild:
+                self.fetch_requests += 1
+                self.rebuilt += len(rebuild)
+                frames = self.downloader(rebuild, period=period)
+                for tkr in rebuild:
+                    new = frame_to_bars(frames.get(tkr))
+                    if not len(new): continue  # download failed: try again on the next update
+                    self._full_from[tkr] = wanted or date.min
+                    self.fetched_bars += len(new)
+                    self._write(tkr, new)
+
+    @staticmethod
+    def _adjusted(final, new):
+        """True when the re-fetched copy of the stored ``final`` bar has a different close (a split or dividend adjustment)."""
+        same = new[new["date"] == final["date"]]
+        return bool(len(same)) and not np.isclose(same["close"][0], final["close"], rtol=ADJUST_TOLERANCE, atol=0)
+
+    def frames(self, tickers, period="1y"):
+        """``{ticker: OHLC frame}`` covering ``period``, read from disk after an incremental update."""
+        self.update(tickers, period)
+        start = period_start(period)
+        out = {}
+        for tkr in tickers:
+            bars = self.bars(tkr)
+            if start is not None and len(bars): bars = bars[np.searchsorted(bars["date"], np.datetime64(start, "D")):]
+            out[tkr] = bars_to_frame(bars)
+        return out
+
+    def stats(self):
+        return {"tickers": len([f for f in os.listdir(self.root) if f.endswith(".npy")]),
+                "requests": self.fetch_requests, "bars_fetched": self.fetched_bars, "rebuilt": self.rebuilt}
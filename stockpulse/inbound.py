@@ -0,0 +1,199 @@
+"""Inbound WhatsApp commands over a Twilio webhook.
+
+Twilio POSTs each inbound message to ``/whatsapp``; the handler answers at
+once and only pushes the message onto a queue. Whoever owns the alert store
+(the poller, or the app when it polls) drains the queue once per cycle.
+One message may carry several commands, one per line::
+
+    AAPL 190
+    TSLA 250 DOWN
+
+Every request must carry a valid Twilio signature, which needs both the
+auth token and the public URL Twilio posts to. ``unsigned=True`` turns the
+check off for local testing and only binds 127.0.0.1.
+
+Message SIDs are recorded in a bounded, persisted index once a drain has
+applied them, so Twilio retries never add an alert twice, while a message
+lost from the in-memory queue by a restart is taken again on retry.
+``post_message`` plays Twilio's part against a local endpoint for testing.
+"""
+import json
+import logging
+import os
+import queue
+import re
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import NamedTuple
+from urllib.parse import parse_qs, urlencode
+from urllib.request import Request, urlopen
+
+from stockpulse.notify import whatsapp_address
+
+log = logging.getLogger(__name__)
+
+COMMAND = re.compile(r"^([A-Z][A-Z0-9.\-]*)\s+(\d+(?:\.\d+)?)(?:\s+(UP|DOWN))?$")
+
+
+class InboundMessage(NamedTuple):
+    sid: str
+    sender: str
+    body: str
+
+
+def parse_commands(body):
+    """``"AAPL 190\\nTSLA 250 DOWN"`` -> ``[("AAPL", 190.0, "Up"), ("TSLA", 250.0, "Down")]``; other lines are ignored."""
+    commands = []
+    for line in str(body).upper().splitlines():
+        match = COMMAND.match(line.strip())
+        if match: commands.append((match.group(1), float(match.group(2)), (match.group(3) or "UP").capitalize()))
+    return commands
+
+
+class SeenIndex:
+    """Bounded, insertion-ordered set of handled message SIDs, persisted as JSON."""
+
+    def __init__(self, path=None, maxsize=5000):
+        self.path = path
+        self.maxsize = maxsize
+        self._sids = OrderedDict()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f: self._sids = OrderedDict.fromkeys(json.load(f)[-maxsize:])
+            except (OSError, ValueError): log.warning("ignoring unreadable seen-SID file %s", path)
+
+    def add(self, sid):
+        """Record ``sid``; returns False if it was already seen."""
+        with self._lock:
+            if sid in self._sids: return False
+            self._sids[sid] = None
+            while len(self._sids) > self.maxsize: self._sids.popitem(last=False)
+            self._save()
+            return True
+
+    def __contains__(self, sid):
+        return sid in self._sids
+
+    def __len__(self):
+        return len(self._sids)
+
+    def _save(self):
+        if not self.path: return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f: json.dump(list(self._sids), f)
+        os.replace(tmp, self.path)
+
+
+class InboundServer:
+    """Threaded HTTP endpoint that queues Twilio WhatsApp webhooks."""
+
+    LOCAL = ("127.0.0.1", "localhost")
+
+    def __init__(self, host="0.0.0.0", port=8502, seen=None, auth_token="", public_url="", unsigned=False):
+        """Raises ValueError when signatures cannot be checked (no auth token or no public URL) unless ``unsigned``."""
+        if unsigned and host not in self.LOCAL: raise ValueError("unsigned webhooks are for testing and only bind 127.0.0.1")
+        if not unsigned and not (auth_token and public_url):
+            raise ValueError("the WhatsApp webhook needs TWILIO_AUTH_TOKEN and INBOUND_URL to check Twilio signatures")
+        self.queue = queue.Queue()
+        self.seen = seen if seen is not None else SeenIndex()
+        self.received = self.duplicates = self.rejected = 0
+        self._queued = set()  # SIDs waiting in the queue, not yet applied
+        self._lock = threading.Lock()
+        validator = None
+        if not unsigned:
+            from twilio.request_validator import RequestValidator
+            validator = RequestValidator(auth_token)
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path.split("?")[0] != "/whatsapp":
+                    self.send_error(404); return
+                length = int(self.headers.get("Content-Length", 0))
+                params = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()}
+                if validator and not validator.validate(public_url, params, self.headers.get("X-Twilio-Signature", "")):
+                    server.rejected += 1
+                    self.send_error(403); return
+                sid = params.get("MessageSid") or params.get("SmsSid", "")
+                if sid and server._claim(sid):
+                    server.received += 1
+                    server.queue.put(InboundMessage(sid, params.get("From", ""), params.get("Body", "")))
+                else:
+                    server.duplicates += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "text/xml")
+                self.end_headers()
+                self.wfile.write(b"<Response/>")
+
+            def log_message(self, fmt, *args):
+                log.debug(fmt, *args)
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self.port = self._httpd.server_address[1]
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="inbound-webhook", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _claim(self, sid):
+        # False for a SID already applied or still waiting in the queue (a Twilio retry)
+        with self._lock:
+            if sid in self.seen or sid in self._queued: return False
+            self._queued.add(sid)
+            return True
+
+    def _done(self, sid):
+        self.seen.add(sid)
+        with self._lock: self._queued.discard(sid)
+
+    def drain_to(self, stores, keep=()):
+        """Route each queued command to its sender's store: ``stores`` maps phone numbers to AlertStores.
+
+        Messages from the ``keep`` numbers (users whose store the caller does not
+        hold) stay queued; any other sender is dropped. Returns
+        ``{phone: [(ticker, target, direction), ...]}`` for the senders that added alerts.
+        """
+        by_address = {whatsapp_address(phone): (phone, store) for phone, store in stores.items() if phone}
+        return self._drain(by_address.get, {whatsapp_address(p) for p in keep if p})
+
+    def _drain(self, route, keep=()):
+        # route(sender address) -> (key, store) or None to drop the message
+        added, kept = {}, []
+        while True:
+            try: msg = self.queue.get_nowait()
+            except queue.Empty: break
+            dest = route(msg.sender)
+            if dest is None and msg.sender in keep:
+                kept.append(msg)
+                continue
+            if dest is None:
+                log.info("dropping inbound message %s from unknown sender", msg.sid)
+                self._done(msg.sid)
+                continue
+            key, store = dest
+            for ticker, target, direction in parse_commands(msg.body):
+                if store.is_duplicate(ticker, target, direction): continue
+                store.add(ticker, target, direction, "WA Add")
+                added.setdefault(key, []).append((ticker, target, direction))
+            self._done(msg.sid)  # only now: a restart before this point lets Twilio's retry through
+        for msg in kept: self.queue.put(msg)
+        return added
+
+    def stats(self):
+        return {"queued": self.queue.qsize(), "received": self.received, "duplicates": self.duplicates,
+                "rejected": self.rejected, "seen": len(self.seen)}
+
+
+def post_message(url, sender, body, sid):
+    """Send a Twilio-shaped inbound webhook to ``url`` (a local stand-in for Twilio)."""
+    data = urlencode({"MessageSid": sid, "From": sender, "To": "whatsapp:+10000000000", "Body": body}).encode()
+    with urlopen(Request(url, data=data, headers={"Content-Type": "application/x-www-form-urlencoded"}), timeout=5) as resp:
+        return resp.status
@@ -0,0 +1,217 @@
+"""Process-wide timing spans, counters and histograms for the hot paths.
+
+    with metrics.span("fetch"): ...        # stage duration + stage error count
+    with metrics.call("smtp"): ...         # one call to an outside service: latency + errors by type
+
+Everything lands in one registry, readable as Prometheus text
+(:func:`prometheus_text`), as a JSON-friendly dict (:func:`snapshot`) or over
+HTTP with :func:`serve` (``/metrics`` and ``/metrics.json``).
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+STAGES = ("cycle", "load", "fetch", "evaluate", "notify", "persist", "render")
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# ==========================================
+# REGISTRY
+# ==========================================
+class Histogram:
+    """Cumulative-bucket histogram plus a window of recent samples for quantiles."""
+
+    __slots__ = ("counts", "sum", "count", "recent")
+
+    def __init__(self, window=512):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        i = 0
+        while i < len(BUCKETS) and value > BUCKETS[i]: i += 1
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+    def quantiles(self, qs=(0.5, 0.95, 0.99)):
+        if not self.recent: return {f"p{int(q * 100)}": None for q in qs}
+        values = np.quantile(np.fromiter(self.recent, float), qs)
+        return {f"p{int(q * 100)}": float(v) for q, v in zip(qs, values)}
+
+
+class Registry:
+    """Counters, gauges and histograms keyed by ``(name, sorted labels)``; safe to update from any thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters, self.gauges, self.histograms = {}, {}, {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock: self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock: self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None: hist = self.histograms[key] = Histogram()
+            hist.observe(value)
+
+    def clear(self):
+        with self._lock: self.counters, self.gauges, self.histograms = {}, {}, {}
+
+
+REGISTRY = Registry()
+
+# ==========================================
+# INSTRUMENTATION HELPERS
+# ==========================================
+@contextmanager
+def span(stage, registry=None, **labels):
+    """Time the block as ``stockpulse_stage_seconds{stage=...}``; an exception also bumps the stage error count."""
+    registry = registry or REGISTRY
+    t0 = time.perf_counter()
+    try: yield
+    except Exception:
+        registry.inc("stockpulse_stage_errors_total", stage=stage, **labels)
+        raise
+    finally:
+        registry.observe("stockpulse_stage_seconds", time.perf_counter() - t0, stage=stage, **labels)
+
+
+def record(stage, seconds, registry=None):
+    """Add a stage duration measured by hand (work split around other stages)."""
+    (registry or REGISTRY).observe("stockpulse_stage_seconds", seconds, stage=stage)
+
+
+@contextmanager
+def call(upstream, registry=None):
+    """Time one call to ``upstream`` (yfinance, sheets, sqlite, smtp, twilio); a failure is counted by type, logged and re-raised."""
+    registry = registry or REGISTRY
+    t0 = time.perf_counter()
+    try: yield
+    except Exception as e:
+        registry.inc("stockpulse_upstream_errors_total", upstream=upstream, error=type(e).__name__)
+        log.warning("%s call failed: %r", upstream, e)
+        raise
+    finally:
+        registry.observe("stockpulse_upstream_seconds", time.perf_counter() - t0, upstream=upstream)
+
+
+def count(name, value=1, **labels):
+    REGISTRY.inc(f"stockpulse_{name}_total", value, **labels)
+
+
+def gauge(name, value, **labels):
+    REGISTRY.set(f"stockpulse_{name}", value, **labels)
+
+# ==========================================
+# EXPORT
+# ==========================================
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs, extra=()):
+    pairs = tuple(pairs) + tuple(extra)
+    if not pairs: return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def prometheus_text(registry=None):
+    """The registry in the Prometheus text exposition format (version 0.0.4)."""
+    registry = registry or REGISTRY
+    with registry._lock:
+        counters, gauges = dict(registry.counters), dict(registry.gauges)
+        hists = {k: (list(h.counts), h.sum, h.count) for k, h in registry.histograms.items()}
+    lines, typed = [], set()
+    def header(name, kind):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} {kind}")
+    for (name, labels), value in sorted(counters.items()):
+        header(name, "counter")
+        lines.append(f"{name}{_labels(labels)} {value}")
+    for (name, labels), value in sorted(gauges.items()):
+        header(name, "gauge")
+        lines.append(f"{name}{_labels(labels)} {value}")
+    for (name, labels), (counts, total, n) in sorted(hists.items()):
+        header(name, "histogram")
+        cumulative = np.cumsum(counts)
+        for bound, c in zip(BUCKETS, cumulative):
+            lines.append(f"{name}_bucket{_labels(labels, [('le', bound)])} {c}")
+        lines.append(f"{name}_bucket{_labels(labels, [('le', '+Inf')])} {n}")
+        lines.append(f"{name}_sum{_labels(labels)} {total}")
+        lines.append(f"{name}_count{_labels(labels)} {n}")
+    return "\n".join(lines) + "\n"
+
+
+def snapshot(registry=None):
+    """Counters and gauges as ``{name: [{labels..., value}]}``, histograms with count, sum and recent quantiles."""
+    registry = registry or REGISTRY
+    out = {"counters": {}, "gauges": {}, "histograms": {}}
+    with registry._lock:
+        for kind, items in (("counters", registry.counters), ("gauges", registry.gauges)):
+            for (name, labels), value in sorted(items.items()):
+                out[kind].setdefault(name, []).append({**dict(labels), "value": value})
+        for (name, labels), hist in sorted(registry.histograms.items()):
+            out["histograms"].setdefault(name, []).append({**dict(labels), "count": hist.count, "sum": hist.sum, **hist.quantiles()})
+    return out
+
+
+def summary(registry=None):
+    """Rows for the stage and upstream tables: runs, errors, mean and recent p50/p95/p99 seconds."""
+    snap = snapshot(registry)
+    def table(hist_name, err_name, key):
+        errors = {}
+        for e in snap["counters"].get(err_name, []): errors[e[key]] = errors.get(e[key], 0) + e["value"]
+        return [{key: h[key], "runs": h["count"], "errors": errors.pop(h[key], 0), "mean_s": h["sum"] / h["count"] if h["count"] else None,
+                 "p50_s": h["p50"], "p95_s": h["p95"], "p99_s": h["p99"]} for h in snap["histograms"].get(hist_name, [])]
+    stages = table("stockpulse_stage_seconds", "stockpulse_stage_errors_total", "stage")
+    stages.sort(key=lambda r: STAGES.index(r["stage"]) if r["stage"] in STAGES else len(STAGES))
+    return {"stages": stages, "upstreams": table("stockpulse_upstream_seconds", "stockpulse_upstream_errors_total", "upstream"),
+            "gauges": {g_name: g[0]["value"] for g_name, g in snap["gauges"].items() if len(g) == 1}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] == "/metrics":
+            body, ctype = prometheus_text(self.registry).encode(), "text/plain; version=0.0.4"
+        elif self.path.split("?")[0] == "/metrics.json":
+            body, ctype = json.dumps(snapshot(self.registry)).encode(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        log.debug("metrics %s", fmt % args)
+
+
+def serve(port, host="0.0.0.0", registry=None):
+    """Serve ``/metrics`` (Prometheus text) and ``/metrics.json`` on a daemon thread; returns the server."""
+    handler = type("Handler", (_Handler,), {"registry": registry or REGISTRY})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    log.info("metrics on http://%s:%d/metrics", host, server.server_address[1])
+    return server
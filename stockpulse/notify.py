@@ -0,0 +1,200 @@
+import logging
+import queue
+import re
+import threading
+import time
+from datetime import datetime
+
+from stockpulse import metrics
+
+log = logging.getLogger(__name__)
+
+# ==========================================
+# NOTIFICATIONS
+# ==========================================
+# Triggers are buffered during a cycle, grouped per (channel, recipient) on
+# flush() into one digest message each, and handed to a small worker pool.
+# Workers share one authenticated SMTP session and one Twilio client, and
+# retry failed sends with exponential backoff.
+
+SMTP_SERVER = "smtp.gmail.com"
+SMTP_PORT = 587
+UPSTREAMS = {"email": "smtp", "whatsapp": "twilio"}
+
+def whatsapp_address(number):
+    clean_digits = re.sub(r'\D', '', str(number))
+    if clean_digits.startswith("0"): clean_digits = "972" + clean_digits[1:]
+    return f"whatsapp:+{clean_digits}"
+
+def make_trigger(row, price):
+    return {"ticker": row['ticker'], "price": float(price), "target": float(row['target_price']),
+            "direction": row['direction'], "notes": row.get('notes', ""), "time": datetime.now()}
+
+def email_message(sender, to_email, triggers):
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+    msg = MIMEMultipart()
+    msg['From'] = sender; msg['To'] = to_email
+    if len(triggers) == 1:
+        t = triggers[0]
+        msg['Subject'] = f"🚀 StockPulse: {t['ticker']} hit ${t['price']:,.2f}"
+        body = f"Ticker: {t['ticker']}\nPrice: ${t['price']}\nTarget: ${t['target']}\nDirection: {t['direction']}\nNote: {t['notes']}\nTime: {t['time']}"
+    else:
+        msg['Subject'] = f"🚀 StockPulse: {len(triggers)} alerts hit ({', '.join(dict.fromkeys(t['ticker'] for t in triggers))})"
+        body = "\n".join(f"{t['ticker']}: ${t['price']:,.2f} (target ${t['target']} {t['direction']}) {t['notes']}".rstrip() for t in triggers)
+        body += f"\nTime: {triggers[-1]['time']}"
+    msg.attach(MIMEText(body, 'plain'))
+    return msg
+
+def whatsapp_body(triggers):
+    if len(triggers) == 1:
+        t = triggers[0]
+        return f"🚀 *{t['ticker']}* Alert!\nPrice: ${t['price']:.2f}\nTarget: ${t['target']}\nDirection: {t['direction']}"
+    lines = [f"*{t['ticker']}* ${t['price']:.2f} (tgt ${t['target']} {t['direction']})" for t in triggers]
+    return f"🚀 {len(triggers)} Alerts!\n" + "\n".join(lines)
+
+
+class SmtpSession:
+    """One authenticated SMTP connection, opened on first use and reopened after it drops."""
+
+    def __init__(self, sender, password, server=SMTP_SERVER, port=SMTP_PORT, idle_timeout=120.0, factory=None):
+        self.sender, self.password = sender, password
+        self.server, self.port = server, port
+        self.idle_timeout = idle_timeout
+        self.factory = factory
+        self._conn = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+        self.logins = 0
+
+    def _connection(self):
+        if self._conn is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            try:
+                with metrics.call("smtp"): self._conn.noop()
+            except Exception: self._conn = None
+        if self._conn is None:
+            factory = self.factory
+            if factory is None:
+                import smtplib
+                factory = smtplib.SMTP
+            with metrics.span("smtp_login"):
+                conn = factory(self.server, self.port)
+                conn.starttls(); conn.login(self.sender, self.password)
+            self._conn = conn
+            self.logins += 1
+            metrics.count("smtp_logins")
+        return self._conn
+
+    def send(self, to_email, triggers):
+        msg = email_message(self.sender, to_email, triggers)
+        with self._lock:
+            try:
+                self._connection().sendmail(self.sender, to_email, msg.as_string())
+                self._last_used = time.monotonic()
+            except Exception:
+                self.close_locked()
+                raise
+
+    def close_locked(self):
+        try:
+            if self._conn is not None: self._conn.quit()
+        except Exception: pass
+        self._conn = None
+
+    def close(self):
+        with self._lock: self.close_locked()
+
+
+class WhatsAppSender:
+    """One Twilio client shared by every WhatsApp send."""
+
+    def __init__(self, sid, token, from_number, client=None):
+        self.sid, self.token, self.from_number = sid, token, from_number
+        self._client = client
+        self._lock = threading.Lock()
+
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                from twilio.rest import Client
+                self._client = Client(self.sid, self.token)
+            return self._client
+
+    def send(self, to_number, triggers):
+        self.client().messages.create(from_=self.from_number, body=whatsapp_body(triggers), to=whatsapp_address(to_number))
+
+    def close(self): pass
+
+
+class NotificationDispatcher:
+    def __init__(self, email=None, whatsapp=None, workers=2, retries=3, backoff=2.0, sleep=time.sleep):
+        self.channels = {"email": email, "whatsapp": whatsapp}
+        self.retries = retries
+        self.backoff = backoff
+        self.sleep = sleep
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self.sent = self.failed = self.retried = self.digested = 0
+        self._counts_lock = threading.Lock()  # the counters are bumped from every worker thread
+        self._workers = [threading.Thread(target=self._work, name=f"notify-{i}", daemon=True) for i in range(workers)]
+        for w in self._workers: w.start()
+
+    def enabled(self, channel):
+        return self.channels.get(channel) is not None
+
+    def enqueue(self, channel, recipient, trigger):
+        """Buffer one trigger; nothing is sent until ``flush()``."""
+        if not recipient or not self.enabled(channel): return
+        with self._pending_lock: self._pending.setdefault((channel, recipient), []).append(trigger)
+
+    def flush(self):
+        """Turn everything buffered since the last flush into one message per (channel, recipient)."""
+        with self._pending_lock: batch, self._pending = self._pending, {}
+        with self._counts_lock: self.digested += sum(len(triggers) - 1 for triggers in batch.values())
+        for (channel, recipient), triggers in batch.items(): self._queue.put((channel, recipient, triggers))
+        return len(batch)
+
+    def _work(self):
+        while True:
+            channel, recipient, triggers = self._queue.get()
+            try:
+                with metrics.span("notify"): self._deliver(channel, recipient, triggers)  # SMTP login, Twilio call, retries
+            finally: self._queue.task_done()
+
+    def _deliver(self, channel, recipient, triggers):
+        sender = self.channels[channel]
+        for attempt in range(self.retries + 1):
+            try:
+                with metrics.call(UPSTREAMS[channel]): sender.send(recipient, triggers)
+                with self._counts_lock: self.sent += 1
+                metrics.count("notifications_sent", channel=channel)
+                return
+            except Exception as e:
+                if attempt == self.retries:
+                    with self._counts_lock: self.failed += 1
+                    metrics.count("notifications_failed", channel=channel)
+                    log.warning("%s to %s failed after %d attempts: %s", channel, recipient, attempt + 1, e)
+                    return
+                with self._counts_lock: self.retried += 1
+                self.sleep(self.backoff * 2 ** attempt)
+
+    def join(self):
+        """Block until every flushed message was sent or gave up."""
+        self._queue.join()
+
+    def stats(self):
+        with self._counts_lock:
+            return {"queued": self._queue.qsize(), "sent": self.sent, "failed": self.failed,
+                    "retried": self.retried, "digested": self.digested}
+
+    def close(self):
+        self.join()
+        for sender in self.channels.values():
+            if sender is not None: sender.close()
+
+
+def make_dispatcher(sender_email="", sender_password="", twilio_sid="", twilio_token="", twilio_from="", **options):
+    email = SmtpSession(sender_email, sender_password) if sender_email and sender_password else None
+    whatsapp = WhatsAppSender(twilio_sid, twilio_token, twilio_from) if twilio_sid else None
+    return NotificationDispatcher(email, whatsapp, **options)
@@ -0,0 +1,171 @@
+import uuid
+
+import pandas as pd
+
+from stockpulse import ALERT_COLUMNS
+
+# ==========================================
+# ROW-LEVEL CHANGE TRACKING
+# ==========================================
+# The sheet is never cleared. A SheetMirror remembers what the sheet holds
+# (header + one row per alert_id, in sheet order); each sync diffs the frame
+# against it and ships only appended rows, modified cells and deleted rows.
+
+def new_alert_id():
+    return uuid.uuid4().hex[:12]
+
+def ensure_ids(df):
+    """Give every row without an ``alert_id`` a fresh one (in place)."""
+    if "alert_id" not in df.columns: df["alert_id"] = ""
+    missing = df["alert_id"].isna() | (df["alert_id"].astype(str) == "")
+    if missing.any():
+        df["alert_id"] = df["alert_id"].astype(object)
+        df.loc[missing, "alert_id"] = [new_alert_id() for _ in range(int(missing.sum()))]
+    return df
+
+def _cell(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)): return ""
+    return str(value)
+
+def _same(a, b):
+    if a == b: return True
+    try: return float(a) == float(b)  # "190" and "190.0" are the same cell
+    except (TypeError, ValueError): return False
+
+
+class ChangeSet:
+    def __init__(self, header=None, updated=None, deleted=None, appended=None):
+        self.header = header            # new header row, only when the schema changed
+        self.updated = updated or {}    # alert_id -> {column: value}
+        self.deleted = deleted or []    # alert_ids
+        self.appended = appended or []  # (alert_id, [values]) in frame order
+
+    def __bool__(self):
+        return bool(self.header or self.updated or self.deleted or self.appended)
+
+
+class SheetMirror:
+    """The last state known to be persisted: header plus rows keyed by alert_id, in storage order."""
+
+    def __init__(self, header=None, rows=None):
+        self.header = list(header or [])
+        self.ids = []
+        self.rows = {}
+        for row in rows or []:
+            row = dict(zip(self.header, row))
+            aid = row.get("alert_id", "")
+            # Legacy rows without an id are keyed by position until the next sync assigns one
+            key = aid or f"__row{len(self.ids)}"
+            self.ids.append(key)
+            self.rows[key] = {c: _cell(row.get(c, "")) for c in self.header}
+
+    def diff(self, df):
+        ensure_ids(df)
+        cols = list(df.columns)
+        header = cols if cols != self.header else None
+        records = df.astype(object).where(df.notna(), "").to_numpy()
+        pos = {c: i for i, c in enumerate(cols)}
+        seen, updated, appended = set(), {}, []
+        for values in records:
+            aid = _cell(values[pos["alert_id"]])
+            seen.add(aid)
+            cells = {c: _cell(values[pos[c]]) for c in cols}
+            old = self.rows.get(aid)
+            if old is None:
+                appended.append((aid, [cells[c] for c in cols]))
+                continue
+            changed = cells if header else {c: v for c, v in cells.items() if not _same(old.get(c), v)}
+            if changed: updated[aid] = changed
+        deleted = [aid for aid in self.ids if aid not in seen]
+        return ChangeSet(header, updated, deleted, appended)
+
+    def adopt_ids(self, df):
+        """Re-key legacy id-less rows to the ids ``ensure_ids`` just gave the matching frame rows."""
+        for i, key in enumerate(self.ids):
+            if key.startswith("__row"):
+                aid = df["alert_id"].iat[i]
+                self.ids[i] = aid
+                self.rows[aid] = self.rows.pop(key)
+
+
+def load_sheet(sheet):
+    """Read the worksheet once; return the alert frame and the mirror of what the sheet holds."""
+    from gspread.utils import numericise_all
+    values = sheet.get_all_values()
+    header, rows = (values[0], values[1:]) if values else ([], [])
+    mirror = SheetMirror(header, rows)
+    df = pd.DataFrame([numericise_all(r, default_blank="") for r in rows], columns=header)
+    for col in ALERT_COLUMNS:
+        if col not in df.columns: df[col] = ""
+    ensure_ids(df)
+    mirror.adopt_ids(df)
+    return df, mirror
+
+
+def _row_numbers(sheet, mirror):
+    """``{alert_id: sheet row}`` as the sheet is now, not as it was at load time.
+
+    Other writers (the poller, other sessions) insert and delete rows, so
+    positional writes are addressed from one fresh read of the id column.
+    A legacy row whose id cell is still blank keeps its mirror position.
+    """
+    if "alert_id" not in mirror.header: return {aid: i + 2 for i, aid in enumerate(mirror.ids)}
+    live = sheet.col_values(mirror.header.index("alert_id") + 1)[1:]
+    known = set(live)
+    row_no = {}
+    for i, aid in enumerate(live):
+        if not aid and i < len(mirror.ids) and mirror.ids[i] not in known: aid = mirror.ids[i]
+        if aid: row_no.setdefault(aid, i + 2)
+    return row_no
+
+
+def push_changes(sheet, mirror, df):
+    """Write the diff between ``mirror`` and ``df`` to a gspread worksheet; the mirror follows each step that succeeds."""
+    from gspread.utils import rowcol_to_a1
+    changes = mirror.diff(df)
+    if not changes: return changes
+    cols = changes.header or mirror.header
+    col_no = {c: i + 1 for i, c in enumerate(cols)}
+    row_no = _row_numbers(sheet, mirror)
+    # Rows another writer deleted since our load: nothing to update or delete there
+    changes.updated = {aid: cells for aid, cells in changes.updated.items() if aid in row_no}
+    gone = [aid for aid in changes.deleted if aid not in row_no]
+    changes.deleted = [aid for aid in changes.deleted if aid in row_no]
+    mirror.ids = [aid for aid in mirror.ids if aid not in gone]
+    for aid in gone: mirror.rows.pop(aid, None)
+
+    # 1. Header + modified cells: one batched range update, one contiguous range per row
+    ranges = []
+    if changes.header: ranges.append({"range": rowcol_to_a1(1, 1), "values": [cols]})
+    for aid, cells in changes.updated.items():
+        nums = sorted(col_no[c] for c in cells)
+        lo, hi = nums[0], nums[-1]
+        current = {**mirror.rows[aid], **cells}
+        ranges.append({"range": f"{rowcol_to_a1(row_no[aid], lo)}:{rowcol_to_a1(row_no[aid], hi)}",
+                       "values": [[current.get(cols[n - 1], "") for n in range(lo, hi + 1)]]})
+    if ranges:
+        sheet.batch_update(ranges, value_input_option="RAW")
+        mirror.header = list(cols)
+        for aid, cells in changes.updated.items():
+            mirror.rows[aid] = {c: {**mirror.rows[aid], **cells}.get(c, "") for c in cols}
+
+    # 2. Deletes: contiguous runs, bottom-up, compacted into one batch request
+    if changes.deleted:
+        nums = sorted((row_no[aid] for aid in changes.deleted), reverse=True)
+        runs = []
+        for n in nums:
+            if runs and runs[-1][0] == n + 1: runs[-1][0] = n
+            else: runs.append([n, n])
+        requests = [{"deleteDimension": {"range": {"sheetId": sheet.id, "dimension": "ROWS", "startIndex": lo - 1, "endIndex": hi}}} for lo, hi in runs]
+        sheet.spreadsheet.batch_update({"requests": requests})
+        gone = set(changes.deleted)
+        mirror.ids = [aid for aid in mirror.ids if aid not in gone]
+        for aid in gone: mirror.rows.pop(aid, None)
+
+    # 3. Appends
+    if changes.appended:
+        sheet.append_rows([values for _, values in changes.appended], value_input_option="RAW")
+        for aid, values in changes.appended:
+            mirror.ids.append(aid)
+            mirror.rows[aid] = dict(zip(cols, values))
+    return changes
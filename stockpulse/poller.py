@@ -0,0 +1,288 @@
+"""Headless alert poller: ``python -m stockpulse.poller``.
+
+Runs the fetch -> evaluate -> notify -> persist cycle on a schedule against
+every user's partition of the shared store, so alerts fire whether or not a
+browser tab is open. Each watched ticker is fetched once per cycle and its
+price fans out to every user's alerts; each user is notified at their own
+saved contacts. The
+Streamlit app then only reads the results. With ``--stream`` every pushed
+tick is evaluated as it arrives instead (``--replay feed.csv`` for a local
+recorded feed). ``--metrics-port`` serves stage timings and error counts
+for Prometheus.
+"""
+import argparse
+import asyncio
+import logging
+import random
+import signal
+import time
+from datetime import datetime
+
+from stockpulse import DEFAULT_USER, metrics
+from stockpulse.config import load_settings, storage_options
+from stockpulse.cycle import run_partitions
+from stockpulse.inbound import InboundServer, SeenIndex
+from stockpulse.notify import make_dispatcher, make_trigger
+from stockpulse.quotes import QuoteCache
+from stockpulse.storage import make_backend
+from stockpulse.ticks import ReplaySource, TickEvaluator, YahooStreamSource
+from stockpulse.triggers import TriggerEngine
+
+log = logging.getLogger("stockpulse.poller")
+
+
+class Poller:
+    def __init__(self, storage, cache, dispatcher, settings, interval=60.0, jitter=5.0, inbound=None):
+        self.storage = storage
+        self.cache = cache
+        self.dispatcher = dispatcher
+        self.inbound = inbound
+        self.settings = settings
+        self.interval = interval
+        self.jitter = jitter
+        self._busy = asyncio.Lock()
+        self.cycles = self.skipped = self.failures = 0
+
+    def contacts(self):
+        """Persisted contact settings per user; the default user falls back to ALERT_EMAIL / ALERT_PHONE."""
+        contacts = self.storage.contacts()
+        own = contacts.setdefault(DEFAULT_USER, {"email": "", "phone": ""})
+        own["email"] = own["email"] or self.settings.get("ALERT_EMAIL", "")
+        own["phone"] = own["phone"] or self.settings.get("ALERT_PHONE", "")
+        return contacts
+
+    def load_partitions(self, contacts):
+        """``{user: (store, mirror)}`` for every partition, plus users who only saved contact settings so far."""
+        return {user: self.storage.load(user) for user in dict.fromkeys([*self.storage.users(), *contacts])}
+
+    def notify(self, contact, row, price):
+        trigger = make_trigger(row, price)
+        self.dispatcher.enqueue("email", contact.get("email"), trigger)
+        self.dispatcher.enqueue("whatsapp", contact.get("phone"), trigger)
+
+    def drain_inbound(self, stores, contacts):
+        """Add queued WhatsApp commands to the store of the user whose phone sent them; returns the users that got alerts."""
+        if self.inbound is None: return set()
+        owner = {c["phone"]: user for user, c in contacts.items() if c.get("phone") and user in stores}
+        added = self.inbound.drain_to({phone: stores[user] for phone, user in owner.items()})
+        for phone, alerts in added.items(): log.info("whatsapp added for %s: %s", owner[phone], ", ".join(t for t, _, _ in alerts))
+        return {owner[phone] for phone in added}
+
+    def _persist(self, partitions, contacts, fired, dirty):
+        """Save each changed partition, then notify its fired alerts; a partition that fails to save is not notified.
+
+        ``fired`` maps users to ``[(row, price)]``. Raises the first save error after the others were written.
+        """
+        error = None
+        for user in dirty:
+            try: self.storage.save(*partitions[user], user=user)
+            except Exception as e:
+                # Nothing was persisted, so these alerts fire again next cycle: don't notify twice
+                log.exception("saving alerts of %s failed", user)
+                error = error or e
+                continue
+            for row, price in fired.get(user, ()): self.notify(contacts.get(user, {}), row, price)
+        self.dispatcher.flush()
+        if error is not None: raise error
+
+    def cycle_once(self):
+        """One blocking cycle over every user's partition; returns the number of alerts fired."""
+        started = time.perf_counter()
+        with metrics.span("cycle"):
+            contacts = self.contacts()
+            partitions = self.load_partitions(contacts)
+            stores = {user: store for user, (store, _) in partitions.items()}
+            added = self.drain_inbound(stores, contacts)
+            fired = {}
+            results = run_partitions(stores, self.cache, lambda user, row, price: fired.setdefault(user, []).append((row, price)))
+            # Only partitions whose prices moved, that fired or that got WhatsApp alerts are written back
+            dirty = [user for user, (_, changed) in results.items() if changed or user in added]
+            self._persist(partitions, contacts, fired, dirty)
+        total = sum(len(f) for f in fired.values())
+        log.info("cycle: %d users (%d saved), %d alerts, %d fired in %.2fs", len(stores), len(dirty), sum(len(s) for s in stores.values()), total,
+                 time.perf_counter() - started)
+        return total
+
+    async def _guarded_cycle(self):
+        async with self._busy:
+            try:
+                await asyncio.to_thread(self.cycle_once)
+                self.cycles += 1
+            except Exception:
+                self.failures += 1
+                log.exception("cycle failed")
+
+    def _fire(self, engine, partitions, contacts, batch):
+        """Notify and persist the alerts fired by a batch of ticks."""
+        now = str(datetime.now())
+        fired, dirty = {}, []
+        for tick, hits in batch:
+            for user, pos in engine.partition(hits).items():
+                store = partitions[user][0]
+                fired.setdefault(user, []).extend((store.row(p), tick.price) for p in pos)
+                store.apply_snapshot({tick.symbol: tick.price}, pos, now)
+                if user not in dirty: dirty.append(user)
+        self._persist(partitions, contacts, fired, dirty)
+
+    async def stream(self, source_factory, stop=None):
+        """Evaluate pushed ticks as they arrive instead of polling snapshots.
+
+        ``source_factory(tickers)`` is called once, with the tickers watched by
+        any user when alerts first exist; one engine holds every partition's
+        alerts. The partitions are reloaded every ``interval`` seconds so
+        alerts added in the UI are picked up: the new engine is swapped in and
+        the source only widened, never restarted. Returns when the source runs
+        out of ticks.
+        """
+        stop = stop or asyncio.Event()
+        loop = asyncio.get_running_loop()
+        source = feed = pending = None
+        exhausted = False
+        try:
+            while not stop.is_set() and not exhausted:
+                try:
+                    contacts = await asyncio.to_thread(self.contacts)
+                    partitions = await asyncio.to_thread(self.load_partitions, contacts)
+                    added = self.drain_inbound({u: s for u, (s, _) in partitions.items()}, contacts)
+                    for user in added: await asyncio.to_thread(self.storage.save, *partitions[user], user=user)
+                except Exception:
+                    self.failures += 1
+                    log.exception("loading alerts failed")
+                    partitions = None
+                engine = TriggerEngine.from_stores({u: s for u, (s, _) in partitions.items()}) if partitions else None
+                if engine is None or (source is None and not engine.tickers):
+                    try: await asyncio.wait_for(stop.wait(), timeout=self.interval)
+                    except asyncio.TimeoutError: pass
+                    continue
+                if source is None:
+                    source = source_factory(engine.tickers)
+                    feed = aiter(source.ticks())
+                else:
+                    await source.watch(engine.tickers)
+
+                fired = []
+                evaluator = TickEvaluator(engine, on_fire=lambda tick, hits: fired.append((tick, hits)))
+                deadline = loop.time() + self.interval
+                try:
+                    # The deadline is only checked between ticks: a batch being fired always finishes before the save below
+                    while not stop.is_set() and loop.time() < deadline:
+                        # The pending read survives the deadline, so no tick is lost and the feed is never cancelled mid-read
+                        pending = pending or asyncio.ensure_future(anext(feed))
+                        done, _ = await asyncio.wait({pending}, timeout=min(1.0, max(0.0, deadline - loop.time())))
+                        if not done: continue
+                        task, pending = pending, None
+                        try: tick = task.result()
+                        except StopAsyncIteration:
+                            exhausted = True
+                            break
+                        except Exception:
+                            self.failures += 1
+                            log.exception("tick source failed, reconnecting on the next reload")
+                            source = feed = None
+                            break
+                        evaluator.process(tick)
+                        if fired:
+                            batch, fired = fired[:], []
+                            await asyncio.to_thread(self._fire, engine, partitions, contacts, batch)
+                except Exception:
+                    self.failures += 1
+                    log.exception("tick stream failed")
+                stats = evaluator.stats()
+                metrics.count("ticks", stats["ticks"])
+                metrics.count("alerts_fired", stats["fired"])
+                log.info("stream: %d ticks, %d fired, p99 %.0fus", stats["ticks"], stats["fired"], stats["p99_us"])
+                if evaluator.last_price:
+                    for user, (store, mirror) in partitions.items():
+                        try:
+                            if store.apply_snapshot(evaluator.last_price, [], ""): await asyncio.to_thread(self.storage.save, store, mirror, user)
+                        except Exception:
+                            log.exception("saving prices of %s failed", user)
+                self.cycles += 1
+        finally:
+            if pending is not None:
+                pending.cancel()
+                await asyncio.gather(pending, return_exceptions=True)
+            if feed is not None: await feed.aclose()
+        if exhausted: log.info("tick source exhausted, stopping")
+
+    async def run(self, stop=None):
+        stop = stop or asyncio.Event()
+        pending = set()
+        while not stop.is_set():
+            if self._busy.locked():
+                # The previous cycle is still running: skip this tick instead of stacking cycles
+                self.skipped += 1
+                metrics.count("cycles_skipped")
+                log.warning("previous cycle still running, skipping tick")
+            else:
+                task = asyncio.create_task(self._guarded_cycle())
+                pending.add(task); task.add_done_callback(pending.discard)
+            delay = max(1.0, self.interval + random.uniform(-self.jitter, self.jitter))
+            try: await asyncio.wait_for(stop.wait(), timeout=delay)
+            except asyncio.TimeoutError: pass
+        if pending: await asyncio.gather(*pending)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m stockpulse.poller", description="Poll prices and fire StockPulse alerts.")
+    parser.add_argument("--secrets", help="path to secrets.toml (default: .streamlit/secrets.toml)")
+    parser.add_argument("--interval", type=float, help="seconds between cycles (POLL_INTERVAL, default 60)")
+    parser.add_argument("--jitter", type=float, help="random +/- seconds added to each interval (POLL_JITTER, default 5)")
+    parser.add_argument("--once", action="store_true", help="run a single cycle and exit")
+    parser.add_argument("--stream", action="store_true", help="evaluate live websocket ticks instead of polling snapshots")
+    parser.add_argument("--replay", metavar="CSV", help="stream a recorded symbol,price,ts feed at its original pace")
+    parser.add_argument("--webhook-port", type=int, help="serve the inbound WhatsApp webhook on this port (INBOUND_PORT)")
+    parser.add_argument("--webhook-unsigned", action="store_true", help="testing only: accept unsigned webhooks on 127.0.0.1")
+    parser.add_argument("--metrics-port", type=int, help="serve /metrics and /metrics.json on this port (METRICS_PORT)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    settings = load_settings(args.secrets)
+    interval = args.interval if args.interval is not None else float(settings.get("POLL_INTERVAL", 60))
+    jitter = args.jitter if args.jitter is not None else float(settings.get("POLL_JITTER", 5))
+    # Quotes only need to outlive one cycle
+    cache = QuoteCache(ttl=min(float(settings.get("QUOTE_TTL", 30)), interval / 2))
+    dispatcher = make_dispatcher(settings.get("SENDER_EMAIL"), settings.get("SENDER_PASSWORD"), settings.get("TWILIO_ACCOUNT_SID"),
+                                 settings.get("TWILIO_AUTH_TOKEN"), settings.get("TWILIO_PHONE_NUMBER"))
+    port = args.webhook_port if args.webhook_port is not None else int(settings.get("INBOUND_PORT", 0))
+    inbound = None
+    if port:
+        try:
+            inbound = InboundServer("127.0.0.1" if args.webhook_unsigned else "0.0.0.0", port,
+                                    SeenIndex(settings.get("INBOUND_SEEN_PATH", "inbound_seen.json")), settings.get("TWILIO_AUTH_TOKEN", ""),
+                                    settings.get("INBOUND_URL", ""), unsigned=args.webhook_unsigned).start()
+        except ValueError as e: parser.error(str(e))
+        log.info("whatsapp webhook on :%d/whatsapp", inbound.port)
+    metrics_port = args.metrics_port if args.metrics_port is not None else int(settings.get("METRICS_PORT", 0))
+    if metrics_port: metrics.serve(metrics_port)
+    poller = Poller(make_backend(**storage_options(settings)), cache, dispatcher, settings, interval, jitter, inbound)
+
+    if args.once:
+        poller.cycle_once()
+        dispatcher.close()
+        if inbound: inbound.stop()
+        return
+
+    async def serve():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try: loop.add_signal_handler(sig, stop.set)
+            except NotImplementedError: pass
+        if args.replay:
+            log.info("replaying %s", args.replay)
+            await poller.stream(lambda tickers: ReplaySource.from_csv(args.replay, speed=1.0), stop)
+        elif args.stream:
+            log.info("streaming ticks, reloading alerts every %.0fs", interval)
+            await poller.stream(YahooStreamSource, stop)
+        else:
+            log.info("polling every %.0fs (+/- %.0fs)", interval, jitter)
+            await poller.run(stop)
+
+    asyncio.run(serve())
+    dispatcher.close()
+    if inbound: inbound.stop()
+
+
+if __name__ == "__main__":
+    main()
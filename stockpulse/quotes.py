@@ -0,0 +1,198 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from stockpulse import metrics
+
+# ==========================================
+# SHARED QUOTE CACHE
+# ==========================================
+# One cache per process, shared by every session. Entries are keyed by
+# (symbol, interval, period), expire after `ttl` seconds and are evicted LRU past
+# `maxsize`. Concurrent misses on the same key are coalesced: the first
+# caller fetches, everyone else waits for its result (single-flight).
+
+class _Flight:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class QuoteCache:
+    def __init__(self, ttl=30.0, maxsize=16384, clock=time.monotonic):  # room for every watched ticker: a cycle must not evict its own batch
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.coalesced = 0
+
+    def _lookup(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None: return None
+        if entry[0] <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key, value, now):
+        self._entries[key] = (now + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key, loader):
+        """Return the cached value for ``key``, calling ``loader()`` at most once per expiry across threads."""
+        return self.get_many([key], lambda keys: {keys[0]: loader()})[key]
+
+    def get_many(self, keys, loader):
+        """Resolve several keys; every key that is neither cached nor in flight goes to one ``loader(missing_keys)`` call.
+
+        ``loader`` returns ``{key: value}``; keys it leaves out resolve to ``None``.
+        """
+        results, owned, waiting = {}, [], {}
+        with self._lock:
+            now = self.clock()
+            for key in dict.fromkeys(keys):
+                entry = self._lookup(key, now)
+                if entry is not None:
+                    self.hits += 1
+                    results[key] = entry[1]
+                elif key in self._flights:
+                    self.coalesced += 1
+                    waiting[key] = self._flights[key]
+                else:
+                    self.misses += 1
+                    self._flights[key] = _Flight()
+                    owned.append(key)
+
+        if owned:
+            try:
+                fetched = loader(owned) or {}
+                error = None
+            except Exception as e:
+                fetched, error = {}, e
+            with self._lock:
+                now = self.clock()
+                for key in owned:
+                    flight = self._flights.pop(key)
+                    flight.error = error
+                    flight.value = fetched.get(key)
+                    if error is None: self._store(key, flight.value, now)
+                    flight.done.set()
+                    results[key] = flight.value
+            if error is not None: raise error
+
+        for key, flight in waiting.items():
+            flight.done.wait()
+            if flight.error is not None: raise flight.error
+            results[key] = flight.value
+        return results
+
+    def clear(self):
+        with self._lock: self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "coalesced": self.coalesced}
+
+
+# ==========================================
+# YFINANCE ACCESS THROUGH THE CACHE
+# ==========================================
+def _history_one(symbol, span):
+    import yfinance as yf
+    try:
+        with metrics.call("yfinance"): return yf.Ticker(symbol).history(**span)
+    except Exception: return pd.DataFrame()
+
+def download_history(symbols, period="5d", interval="1d", max_workers=8, start=None):
+    """One multi-ticker yfinance request; returns ``{symbol: OHLC frame}`` (empty frame when no data).
+
+    ``start`` (a date) replaces ``period`` to fetch only the bars from that day on.
+    Symbols the batch request fails to return are retried concurrently, one request each.
+    """
+    import yfinance as yf
+    span = {"start": start, "interval": interval} if start is not None else {"period": period, "interval": interval}
+    out = {}
+    try:
+        with metrics.call("yfinance"): data = yf.download(symbols, group_by="ticker", progress=False, threads=True, **span)
+        for sym in symbols:
+            if isinstance(data.columns, pd.MultiIndex):
+                frame = data[sym] if sym in data.columns.get_level_values(0) else pd.DataFrame()
+            else:
+                frame = data if len(symbols) == 1 else pd.DataFrame()
+            out[sym] = frame.dropna(how="all")
+    except Exception:
+        pass
+    missing = [s for s in symbols if out.get(s) is None or out[s].empty]
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as pool:
+            for sym, frame in zip(missing, pool.map(lambda s: _history_one(s, span), missing)):
+                out[sym] = frame.dropna(how="all")
+    return out
+
+class Bars(NamedTuple):
+    """A cached download: the OHLC frame and its latest close (NaN without data), taken once when it is stored."""
+    frame: object
+    last: float
+
+def _bars(frame):
+    if frame is None or frame.empty or "Close" not in frame: return Bars(frame, np.nan)
+    closes = frame.to_numpy(dtype=float)[:, frame.columns.get_loc("Close")]  # a fraction of frame["Close"]'s cost
+    closes = closes[~np.isnan(closes)]
+    return Bars(frame, float(closes[-1]) if closes.size else np.nan)
+
+def _cached_bars(symbols, cache, interval, period, fetch):
+    # The period is part of the key: a cached 5d entry never answers for a longer span
+    def load(missing):
+        frames = (fetch or download_history)([s for s, _, _ in missing], period=period, interval=interval)
+        return {key: _bars(frames.get(key[0])) for key in missing}
+    got = cache.get_many([(s, interval, period) for s in symbols], load)
+    return {s: got[(s, interval, period)] for s in symbols}
+
+def recent_history(symbols, cache, interval="1d", period="5d", fetch=None):
+    """Recent bars per symbol, served from ``cache`` and fetched in one batch for every miss.
+
+    ``fetch`` stands in for :func:`download_history` (same signature), e.g. an offline market.
+    """
+    return {s: bars.frame if bars is not None else None for s, bars in _cached_bars(symbols, cache, interval, period, fetch).items()}
+
+def last_prices(symbols, cache, interval="1d", period="5d", fetch=None):
+    """Latest close per symbol; symbols without data are left out. No frame is touched on a cache hit."""
+    return {s: bars.last for s, bars in _cached_bars(symbols, cache, interval, period, fetch).items()
+            if bars is not None and bars.last == bars.last}
+
+def close_matrix(frames):
+    """Align the Close columns of ``{name: OHLC frame}`` into one dates x names frame."""
+    closes = {name: f["Close"] for name, f in frames.items() if f is not None and not f.empty and "Close" in f}
+    if not closes: return pd.DataFrame(columns=list(frames))
+    return pd.concat(closes, axis=1).reindex(columns=list(frames))
+
+def last_and_change(closes):
+    """Latest close and % change from the previous close per column, ignoring each column's own gaps.
+
+    Returns ``(price, delta_pct)`` arrays; columns without data give 0.0.
+    """
+    a = closes.to_numpy(dtype=float)
+    if not a.size: return np.zeros(a.shape[1]), np.zeros(a.shape[1])
+    valid = ~np.isnan(a)
+    from_end = np.cumsum(valid[::-1], axis=0)[::-1]  # valid bars at or after each row
+    filled = np.where(valid, a, 0.0)
+    price = np.where(valid & (from_end == 1), filled, 0.0).sum(axis=0)
+    prev = np.where(valid & (from_end == 2), filled, 0.0).sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta = np.where(prev > 0, (price - prev) / prev * 100, 0.0)
+    return np.nan_to_num(price), np.nan_to_num(delta)
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+from stockpulse.quotes import download_history
+
+# ==========================================
+# SMART STOP-LOSS (VECTORIZED)
+# ==========================================
+# Prices are laid out as 2-D (bars x tickers) arrays. Each ticker's bars are
+# right-aligned (its NaN gaps pushed to the top), so a column is the ticker's
+# own bar sequence no matter how the calendars of different tickers differ.
+
+MA_WINDOW = 150
+ATR_WINDOW = 14
+REASONS = np.array(["Volatility (2x ATR)", "Max Loss Limit (12%)", "MA150 Support Rule", "Immediate Exit (Price violated rules)"])
+
+def stack_ohlc(frames, tickers):
+    """``{ticker: OHLC frame}`` -> right-aligned ``(high, low, close)`` arrays of shape (bars, tickers)."""
+    cols = {}
+    for field in ("High", "Low", "Close"):
+        series = {t: frames[t][field] for t in tickers if frames.get(t) is not None and not frames[t].empty and field in frames[t]}
+        cols[field] = pd.concat(series, axis=1).reindex(columns=tickers) if series else pd.DataFrame(columns=tickers)
+    close = cols["Close"].to_numpy(dtype=float)
+    high = cols["High"].reindex(cols["Close"].index).to_numpy(dtype=float)
+    low = cols["Low"].reindex(cols["Close"].index).to_numpy(dtype=float)
+    valid = ~np.isnan(close)
+    order = np.argsort(valid, axis=0, kind="stable")  # invalid (False) rows first, bar order kept
+    return tuple(np.take_along_axis(a, order, axis=0) for a in (high, low, close))
+
+def rolling_mean(a, window):
+    """Column-wise trailing mean; NaN until ``window`` valid values are in the window."""
+    filled = np.where(np.isnan(a), 0.0, a)
+    csum = np.cumsum(filled, axis=0)
+    ccnt = np.cumsum(~np.isnan(a), axis=0)
+    pad = np.zeros((1, a.shape[1]))
+    csum = np.vstack((pad, csum)); ccnt = np.vstack((pad, ccnt))
+    total = csum[window:] - csum[:-window]
+    count = ccnt[window:] - ccnt[:-window]
+    out = np.full(a.shape, np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out[window - 1:] = np.where(count == window, total / window, np.nan)
+    return out
+
+def true_range(high, low, close):
+    prev = np.vstack((np.full((1, close.shape[1]), np.nan), close[:-1]))
+    return np.fmax(high - low, np.fmax(np.abs(high - prev), np.abs(low - prev)))
+
+def stop_rules(entry, current, ma150, atr):
+    """The Smart SL rule chain over arrays; returns ``(stop, reason_code)``."""
+    stop = entry - 2 * atr
+    reason = np.zeros(stop.shape, dtype=int)
+    floor = entry * 0.88
+    m = stop < floor; stop = np.where(m, floor, stop); reason[m] = 1
+    m = (current > ma150) & (stop < ma150); stop = np.where(m, ma150, stop); reason[m] = 2
+    m = stop >= current; stop = np.where(m, current * 0.99, stop); reason[m] = 3
+    return stop, reason
+
+def smart_sl_table(tickers, entries, frames=None, period="1y", store=None):
+    """Smart SL for a whole portfolio with one multi-ticker history request.
+
+    ``entries`` are buy prices (0 means "use the current price"). Bars come
+    from ``frames`` if given, else from the local ``store`` (a HistoryStore,
+    which only downloads missing bars), else straight from yfinance. Returns
+    one row per ticker; tickers that cannot be computed carry an ``error``.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    entry_of = dict(zip(tickers, entries))
+    if frames is None: frames = store.frames(tickers, period) if store is not None else download_history(tickers, period=period)
+    high, low, close = stack_ohlc(frames, tickers)
+
+    bars = (~np.isnan(close)).sum(axis=0)
+    ma150 = rolling_mean(close, MA_WINDOW)[-1] if len(close) >= MA_WINDOW else np.full(len(tickers), np.nan)
+    atr = rolling_mean(true_range(high, low, close), ATR_WINDOW)[-1] if len(close) >= ATR_WINDOW else np.full(len(tickers), np.nan)
+    current = close[-1] if len(close) else np.full(len(tickers), np.nan)
+    buy = np.array([float(entry_of[t] or 0) for t in tickers])
+    entry = np.where(buy > 0, buy, current)
+    stop, reason = stop_rules(entry, current, ma150, atr)
+
+    table = pd.DataFrame({"ticker": tickers, "entry": entry, "current_price": current, "ma150": ma150, "atr": atr,
+                          "sl_price": stop, "reason": REASONS[reason], "trend": np.where(current > ma150, "UP 🟢", "DOWN 🔴")})
+    table["error"] = np.where(bars == 0, "No price data", np.where(bars < MA_WINDOW, "Not enough data for MA150", ""))
+    return table
+
+def parse_portfolio(text):
+    """``"AAPL 180\\nTSLA"`` -> ``(["AAPL", "TSLA"], [180.0, 0.0])``; malformed lines are skipped."""
+    tickers, entries = [], []
+    for line in text.splitlines():
+        parts = line.replace(",", " ").split()
+        if not parts: continue
+        try: entry = float(parts[1]) if len(parts) > 1 else 0.0
+        except ValueError: continue
+        tickers.append(parts[0].upper()); entries.append(entry)
+    return tickers, entries
@@ -0,0 +1,109 @@
+"""Cold-start budget for the app: imports and first script run, each timed in a fresh interpreter.
+
+    python -m stockpulse.startup                  # measure, print, exit 1 when over budget
+    python -m stockpulse.startup --runs 5 --app app.py
+
+The import sample executes only ``app.py``'s top-level import statements and
+lists which of the HEAVY client libraries they pulled in (those belong inside
+the functions that use them). The first-run sample drives the whole script
+once through Streamlit's AppTest against SQLite in a temporary directory and
+no market symbols, so it measures the app rather than the network.
+"""
+import argparse
+import ast
+import json
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+BUDGET = {"import_s": 1.5, "first_run_s": 3.0}
+HEAVY = ("yfinance", "gspread", "oauth2client", "twilio", "smtplib", "email.mime")
+
+_IMPORTS = """
+import json, sys, time
+t0 = time.perf_counter()
+exec(compile({source!r}, {app!r}, "exec"))
+took = time.perf_counter() - t0
+print(json.dumps({{"import_s": took, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+_FIRST_RUN = """
+import json, time
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout=60)
+at.secrets["STORAGE_BACKEND"] = "sqlite"
+at.secrets["SQLITE_PATH"] = {db!r}
+at.secrets["HISTORY_DIR"] = {history!r}
+at.secrets["MARKET_SYMBOLS"] = {{}}
+t0 = time.perf_counter()
+at.run()
+took = time.perf_counter() - t0
+print(json.dumps({{"first_run_s": took, "errors": [str(e.value) for e in at.exception]}}))
+"""
+
+# ==========================================
+# MEASUREMENT
+# ==========================================
+def import_source(path):
+    """The top-level ``import`` / ``from ... import`` statements of ``path``, as source."""
+    with open(path) as f: source = f.read()
+    tree = ast.parse(source)
+    return "\n".join(ast.get_source_segment(source, node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def _sample(code):
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if out.returncode: raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr.strip() else f"exit {out.returncode}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure_imports(app="app.py"):
+    return _sample(_IMPORTS.format(source=import_source(app), app=app, heavy=HEAVY))
+
+
+def measure_first_run(app="app.py"):
+    with tempfile.TemporaryDirectory() as tmp:
+        return _sample(_FIRST_RUN.format(app=app, db=f"{tmp}/startup.db", history=f"{tmp}/history"))
+
+
+def run(app="app.py", runs=3):
+    """Median import and first-run seconds over ``runs`` fresh processes, plus what went wrong."""
+    imports = [measure_imports(app) for _ in range(runs)]
+    first = [measure_first_run(app) for _ in range(runs)]
+    return {"import_s": float(np.median([r["import_s"] for r in imports])),
+            "first_run_s": float(np.median([r["first_run_s"] for r in first])),
+            "heavy": sorted({m for r in imports for m in r["heavy"]}),
+            "errors": sorted({e for r in first for e in r["errors"]})}
+
+
+def violations(result, budget=BUDGET):
+    """Human-readable reasons the result misses the budget; empty when it is within."""
+    out = [f"{k} {result[k]:.2f}s > {limit:.2f}s" for k, limit in budget.items() if result[k] > limit]
+    if result["heavy"]: out.append(f"imported at startup: {', '.join(result['heavy'])}")
+    out.extend(f"first run raised: {e}" for e in result["errors"])
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check StockPulse cold-start time against its budget")
+    parser.add_argument("--app", default="app.py")
+    parser.add_argument("--runs", type=int, default=3, help="fresh processes per sample")
+    parser.add_argument("--import-budget", type=float, default=BUDGET["import_s"], help="seconds")
+    parser.add_argument("--first-run-budget", type=float, default=BUDGET["first_run_s"], help="seconds")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args(argv)
+
+    result = run(args.app, args.runs)
+    missed = violations(result, {"import_s": args.import_budget, "first_run_s": args.first_run_budget})
+    if args.json: print(json.dumps({**result, "violations": missed}, indent=1))
+    else:
+        print(f"imports    {result['import_s'] * 1e3:>8.0f} ms  (budget {args.import_budget * 1e3:.0f} ms)")
+        print(f"first run  {result['first_run_s'] * 1e3:>8.0f} ms  (budget {args.first_run_budget * 1e3:.0f} ms)")
+        for m in missed: print(f"OVER BUDGET: {m}")
+    return 1 if missed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
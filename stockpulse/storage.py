@@ -0,0 +1,270 @@
+import hashlib
+import hmac
+import os
+import re
+import sqlite3
+import threading
+
+import pandas as pd
+
+from stockpulse import ALERT_COLUMNS, CONTACT_COLUMNS, DEFAULT_USER, metrics
+from stockpulse.alerts import AlertStore
+from stockpulse.persistence import SheetMirror, load_sheet, push_changes
+
+# ==========================================
+# STORAGE BACKENDS
+# ==========================================
+# Alerts are partitioned per user. Every backend exposes the same calls:
+#   load(user)                 -> (AlertStore, mirror of what is persisted)
+#   save(store, mirror, user)  -> ChangeSet actually written; the mirror follows the writes
+#   users()                    -> every partition that exists, DEFAULT_USER first
+#   contacts()                 -> {user: {"email": ..., "phone": ..., "pin": <hash or "">}}
+#   save_contact(user, email, phone, pin=None)   (pin=None keeps the stored one)
+# Backends are meant to be created once per process and shared by all sessions.
+# A partition name is not a credential: a partition whose user set a PIN is
+# only opened by a session that presents it (see check_pin).
+
+PIN_ROUNDS = 200_000
+
+def user_key(name):
+    """Canonical partition key for a user name: lower case, letters, digits and ``._@+-`` only."""
+    key = re.sub(r"[^a-z0-9._@+-]", "", str(name or "").strip().lower())
+    return key or DEFAULT_USER
+
+def hash_pin(pin):
+    """Salted PBKDF2 hash of a user's PIN, as stored next to their contacts."""
+    salt = os.urandom(16)
+    return f"{salt.hex()}${hashlib.pbkdf2_hmac('sha256', str(pin).encode(), salt, PIN_ROUNDS).hex()}"
+
+def check_pin(stored, pin):
+    """True when ``pin`` matches the ``stored`` hash; a partition without a PIN matches nothing."""
+    salt, _, digest = str(stored or "").partition("$")
+    if not digest or not pin: return False
+    try: got = hashlib.pbkdf2_hmac("sha256", str(pin).encode(), bytes.fromhex(salt), PIN_ROUNDS).hex()
+    except ValueError: return False
+    return hmac.compare_digest(got, digest)
+
+def _contact_map(rows):
+    return {str(r[0]): {"email": str(r[1] or ""), "phone": str(r[2] or ""), "pin": str(r[3] or "") if len(r) > 3 else ""}
+            for r in rows if len(r) >= 3 and r[0]}
+
+
+class SheetsBackend:
+    """Google Sheets storage with one authorized client reused for the life of the process.
+
+    The default user's alerts stay on the first worksheet; every other user
+    gets an ``alerts:<user>`` worksheet, created on first use. Contact
+    settings live on a ``users`` worksheet.
+    """
+
+    SCOPE = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
+    PARTITION_PREFIX = "alerts:"
+    CONTACTS_TITLE = "users"
+
+    def __init__(self, credentials, sheet_id, worksheet=None):
+        self.credentials = dict(credentials)
+        self.sheet_id = sheet_id
+        self._preset = worksheet  # pre-opened default worksheet (or an offline stand-in) skips authorization
+        self._book = None
+        self._sheets = {}
+        self._lock = threading.Lock()
+
+    def spreadsheet(self):
+        if self._book is None:
+            if self._preset is not None: self._book = self._preset.spreadsheet
+            else:
+                import gspread
+                from oauth2client.service_account import ServiceAccountCredentials
+                creds = ServiceAccountCredentials.from_json_keyfile_dict(self.credentials, self.SCOPE)
+                self._book = gspread.authorize(creds).open_by_key(self.sheet_id)
+        return self._book
+
+    def _open(self, title, header=None):
+        import gspread
+        book = self.spreadsheet()
+        try: return book.worksheet(title)
+        except gspread.WorksheetNotFound:
+            sheet = book.add_worksheet(title, rows=100, cols=len(header or ALERT_COLUMNS))
+            if header: sheet.append_rows([header], value_input_option="RAW")
+            return sheet
+
+    def worksheet(self, user=DEFAULT_USER):
+        with self._lock:
+            sheet = self._sheets.get(user)
+            if sheet is None:
+                if user == DEFAULT_USER: sheet = self._preset or self.spreadsheet().sheet1
+                else: sheet = self._open(self.PARTITION_PREFIX + user)
+                self._sheets[user] = sheet
+            return sheet
+
+    def _reset(self):
+        # Drop the cached handles so the next call re-authorizes (expired token, dropped session)
+        with self._lock: self._book, self._sheets = None, {}
+
+    def load(self, user=DEFAULT_USER):
+        with metrics.span("load"):
+            try:
+                with metrics.call("sheets"): df, mirror = load_sheet(self.worksheet(user))
+            except Exception:
+                self._reset()
+                raise
+            return AlertStore.from_frame(df), mirror
+
+    def save(self, store, mirror, user=DEFAULT_USER):
+        with metrics.span("persist"):
+            df = store.frame()
+            # Keep the sheet's own column order so only changed cells are written
+            cols = [c for c in mirror.header if c in df.columns] + [c for c in df.columns if c not in mirror.header]
+            try:
+                with metrics.call("sheets"): return push_changes(self.worksheet(user), mirror, df[cols])
+            except Exception:
+                self._reset()
+                raise
+
+    def users(self):
+        try:
+            with metrics.call("sheets"): titles = [ws.title for ws in self.spreadsheet().worksheets()]
+        except Exception:
+            self._reset()
+            raise
+        n = len(self.PARTITION_PREFIX)
+        return [DEFAULT_USER] + [t[n:] for t in titles if t.startswith(self.PARTITION_PREFIX) and t[n:] != DEFAULT_USER]
+
+    def contacts(self):
+        try:
+            with metrics.call("sheets"): values = self._contacts().get_all_values()
+        except Exception:
+            self._reset()
+            raise
+        return _contact_map(values[1:])
+
+    def _contacts(self):
+        with self._lock:
+            # Keyed apart from user ids, which share the dict
+            sheet = self._sheets.get(None)
+            if sheet is None: sheet = self._sheets[None] = self._open(self.CONTACTS_TITLE, CONTACT_COLUMNS)
+            return sheet
+
+    def save_contact(self, user, email="", phone="", pin=None):
+        try:
+            with metrics.call("sheets"):
+                sheet = self._contacts()
+                values = sheet.get_all_values()
+                if pin is not None and values and len(values[0]) < len(CONTACT_COLUMNS):
+                    # A users sheet from before PINs: widen it and name the new column
+                    cols = getattr(sheet, "col_count", len(CONTACT_COLUMNS))
+                    if cols < len(CONTACT_COLUMNS): sheet.add_cols(len(CONTACT_COLUMNS) - cols)
+                    sheet.batch_update([{"range": "A1:D1", "values": [CONTACT_COLUMNS]}], value_input_option="RAW")
+                ids = [r[0] if r else "" for r in values]
+                row = [user, email or "", phone or ""] + ([] if pin is None else [pin])
+                if user in ids[1:]:
+                    n = ids.index(user, 1) + 1
+                    end = "C" if pin is None else "D"
+                    sheet.batch_update([{"range": f"A{n}:{end}{n}", "values": [row]}], value_input_option="RAW")
+                else: sheet.append_rows([row + [""] * (len(CONTACT_COLUMNS) - len(row))], value_input_option="RAW")
+        except Exception:
+            self._reset()
+            raise
+
+
+class SQLiteBackend:
+    """Local SQLite storage keyed by alert_id; writes are point inserts, updates and deletes.
+
+    Partitions share one table through the ``owner`` column.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS alerts (
+            alert_id TEXT PRIMARY KEY,
+            ticker TEXT NOT NULL,
+            target_price REAL,
+            current_price REAL,
+            direction TEXT,
+            notes TEXT,
+            created_at TEXT,
+            status TEXT,
+            triggered_at TEXT,
+            seq INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS idx_alerts_status ON alerts(status);
+        CREATE INDEX IF NOT EXISTS idx_alerts_ticker ON alerts(ticker);
+        CREATE TABLE IF NOT EXISTS users (
+            user_id TEXT PRIMARY KEY,
+            email TEXT,
+            phone TEXT,
+            pin TEXT NOT NULL DEFAULT ''
+        );
+    """
+
+    def __init__(self, path="stockpulse.db"):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(self.SCHEMA)
+        # Databases from before partitions: every existing alert belongs to the default user
+        if "owner" not in [r[1] for r in self._conn.execute("PRAGMA table_info(alerts)")]:
+            with self._conn: self._conn.execute(f"ALTER TABLE alerts ADD COLUMN owner TEXT NOT NULL DEFAULT '{DEFAULT_USER}'")
+        if "pin" not in [r[1] for r in self._conn.execute("PRAGMA table_info(users)")]:
+            with self._conn: self._conn.execute("ALTER TABLE users ADD COLUMN pin TEXT NOT NULL DEFAULT ''")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_owner ON alerts(owner, seq)")
+        self._lock = threading.Lock()
+
+    def load(self, user=DEFAULT_USER):
+        with metrics.span("load"):
+            with self._lock, metrics.call("sqlite"):
+                rows = self._conn.execute(f"SELECT {', '.join(ALERT_COLUMNS)} FROM alerts WHERE owner = ? ORDER BY seq", (user,)).fetchall()
+            df = pd.DataFrame(rows, columns=ALERT_COLUMNS)
+            df = df.astype(object).where(df.notna(), "")
+            return AlertStore.from_frame(df), SheetMirror(ALERT_COLUMNS, [list(r) for r in df.to_numpy()])
+
+    def save(self, store, mirror, user=DEFAULT_USER):
+        with metrics.span("persist"): return self._save(store, mirror, user)
+
+    def _save(self, store, mirror, user):
+        changes = mirror.diff(store.frame())
+        if not changes: return changes
+        with self._lock, metrics.call("sqlite"), self._conn:
+            for aid, cells in changes.updated.items():
+                cols = [c for c in cells if c in ALERT_COLUMNS and c != "alert_id"]
+                if not cols: continue
+                self._conn.execute(f"UPDATE alerts SET {', '.join(f'{c} = ?' for c in cols)} WHERE alert_id = ? AND owner = ?",
+                                   [cells[c] for c in cols] + [aid, user])
+            if changes.deleted:
+                self._conn.executemany("DELETE FROM alerts WHERE alert_id = ? AND owner = ?", [(aid, user) for aid in changes.deleted])
+            if changes.appended:
+                seq = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM alerts").fetchone()[0]
+                self._conn.executemany(
+                    f"INSERT INTO alerts ({', '.join(ALERT_COLUMNS)}, owner, seq) VALUES ({', '.join('?' * (len(ALERT_COLUMNS) + 2))})",
+                    [(*values, user, seq + i + 1) for i, (_, values) in enumerate(changes.appended)])
+        # The transaction committed: move the mirror forward
+        for aid, cells in changes.updated.items(): mirror.rows[aid].update(cells)
+        gone = set(changes.deleted)
+        mirror.ids = [aid for aid in mirror.ids if aid not in gone]
+        for aid in gone: mirror.rows.pop(aid, None)
+        for aid, values in changes.appended:
+            mirror.ids.append(aid)
+            mirror.rows[aid] = dict(zip(ALERT_COLUMNS, values))
+        return changes
+
+    def users(self):
+        with self._lock, metrics.call("sqlite"):
+            found = [r[0] for r in self._conn.execute("SELECT owner FROM alerts UNION SELECT user_id FROM users")]
+        return [DEFAULT_USER] + sorted(u for u in found if u != DEFAULT_USER)
+
+    def contacts(self):
+        with self._lock, metrics.call("sqlite"):
+            return _contact_map(self._conn.execute(f"SELECT {', '.join(CONTACT_COLUMNS)} FROM users").fetchall())
+
+    def save_contact(self, user, email="", phone="", pin=None):
+        keep = "" if pin is None else ", pin = excluded.pin"
+        with self._lock, metrics.call("sqlite"), self._conn:
+            self._conn.execute("INSERT INTO users (user_id, email, phone, pin) VALUES (?, ?, ?, ?) "
+                               f"ON CONFLICT(user_id) DO UPDATE SET email = excluded.email, phone = excluded.phone{keep}",
+                               (user, email or "", phone or "", pin or ""))
+
+
+def make_backend(kind, **options):
+    """Build a backend from configuration: ``"sheets"`` (credentials, sheet_id) or ``"sqlite"`` (path)."""
+    kind = (kind or "sheets").lower()
+    if kind == "sqlite": return SQLiteBackend(options.get("path") or "stockpulse.db")
+    if kind == "sheets": return SheetsBackend(options["credentials"], options["sheet_id"])
+    raise ValueError(f"Unknown storage backend: {kind}")
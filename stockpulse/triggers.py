@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# TRIGGER ENGINE
+# ==========================================
+# Active alerts are kept per ticker as two sorted threshold arrays:
+#   Up   -> fires when price >= target, so every target <= price is crossed (a prefix)
+#   Down -> fires when price <= target, so every target >= price is crossed (a suffix)
+# One binary search per ticker and side finds every crossed alert.
+
+_NONE = np.array([], dtype=object)
+
+
+class _Book:
+    __slots__ = ("up_tgt", "up_ids", "down_tgt", "down_ids")
+
+    def __init__(self, up_tgt, up_ids, down_tgt, down_ids):
+        self.up_tgt, self.up_ids = up_tgt, up_ids
+        self.down_tgt, self.down_ids = down_tgt, down_ids
+
+    def crossed(self, price):
+        n_up = np.searchsorted(self.up_tgt, price, side="right")
+        n_down = np.searchsorted(self.down_tgt, price, side="left")
+        return self.up_ids[:n_up], self.down_ids[n_down:]
+
+    def drop(self, ids):
+        keep = ~np.isin(self.up_ids, ids)
+        self.up_tgt, self.up_ids = self.up_tgt[keep], self.up_ids[keep]
+        keep = ~np.isin(self.down_ids, ids)
+        self.down_tgt, self.down_ids = self.down_tgt[keep], self.down_ids[keep]
+
+    def __len__(self):
+        return len(self.up_ids) + len(self.down_ids)
+
+
+def _same_stores(a, b):
+    return len(a) == len(b) and all(ka == kb and sa is sb for (ka, sa), (kb, sb) in zip(a, b))
+
+
+class TriggerEngine:
+    """Sorted per-ticker threshold books for the active alerts of an alert frame."""
+
+    def __init__(self, books=None):
+        self._books = books or {}
+        self._keys, self._offsets = [None], np.zeros(1, dtype=np.int64)
+
+    @classmethod
+    def from_frame(cls, df):
+        if df.empty: return cls()
+        active = df[df["status"] == "Active"]
+        codes, uniques = pd.factorize(active["ticker"].to_numpy())
+        targets = pd.to_numeric(active["target_price"], errors="coerce").to_numpy(dtype=float)
+        return cls._build(codes, list(uniques), targets, (active["direction"] == "Up").to_numpy(),
+                          (active["direction"] == "Down").to_numpy(), active.index.to_numpy())
+
+    @classmethod
+    def from_stores(cls, stores):
+        """One engine over several AlertStores (user partitions) sharing a single book per ticker.
+
+        ``stores`` maps a partition key to its store. Labels are the store
+        position plus the partition's offset; :meth:`partition` maps them back.
+        """
+        from stockpulse.alerts import ACTIVE, DOWN, UP
+        code_of, parts, keys, offsets, offset = {}, [], [], [], 0
+        for key, store in stores.items():
+            pos = np.flatnonzero(store.column("status") == ACTIVE)
+            remap = np.array([code_of.setdefault(t, len(code_of)) for t in store.tickers], dtype=np.int64)
+            direction = store.column("direction")[pos]
+            codes = remap[store.column("ticker")[pos]] if len(remap) else np.empty(0, dtype=np.int64)
+            parts.append((codes, store.column("target_price")[pos], direction == UP, direction == DOWN, pos + offset))
+            keys.append(key); offsets.append(offset)
+            offset += len(store)
+        if not parts: return cls()
+        codes, targets, is_up, is_down, ids = (np.concatenate(cols) for cols in zip(*parts))
+        engine = cls._build(codes, list(code_of), targets, is_up, is_down, ids)
+        engine._keys, engine._offsets = keys, np.array(offsets, dtype=np.int64)
+        return engine
+
+    @classmethod
+    def cached(cls, stores):
+        """:meth:`from_stores`, reused while none of the stores changed (``AlertStore.version``) since it was built.
+
+        The cache lives on the first store; a caller that changes the stores
+        itself and keeps the engine in step calls :meth:`remember` afterwards.
+        """
+        parts = tuple(stores.items())
+        if not parts: return cls()
+        hit = parts[0][1]._trigger_cache
+        if hit is not None and _same_stores(hit[0], parts) and hit[1] == tuple(store.version for _, store in parts): return hit[2]
+        engine = cls.from_stores(stores)
+        engine.remember(stores)
+        return engine
+
+    def remember(self, stores):
+        """Cache this engine for ``stores`` as they are now (see :meth:`cached`)."""
+        parts = tuple(stores.items())
+        if parts: parts[0][1]._trigger_cache = (parts, tuple(store.version for _, store in parts), self)
+
+    def offset(self, key):
+        """Label offset of partition ``key``: its store positions plus this are the engine's labels."""
+        return int(self._offsets[self._keys.index(key)])
+
+    def partition(self, labels):
+        """``{key: store positions}`` for labels of an engine built by :meth:`from_stores`."""
+        labels = np.asarray(labels, dtype=np.int64)
+        if not len(labels): return {}
+        which = np.searchsorted(self._offsets, labels, side="right") - 1
+        return {self._keys[i]: labels[which == i] - self._offsets[i] for i in np.unique(which)}
+
+    @classmethod
+    def _build(cls, codes, uniques, targets, is_up, is_down, ids):
+        valid = ~np.isnan(targets)
+        codes, targets, is_up, is_down, ids = codes[valid], targets[valid], is_up[valid], is_down[valid], ids[valid]
+        if not len(ids): return cls()
+
+        # One lexsort groups rows by ticker and orders each group by target
+        order = np.lexsort((targets, codes))
+        codes, targets, ids, is_up, is_down = codes[order], targets[order], ids[order], is_up[order], is_down[order]
+        bounds = np.flatnonzero(np.diff(codes)) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(codes)]))
+
+        books = {}
+        for code, s, e in zip(codes[starts], starts, ends):
+            up, down = is_up[s:e], is_down[s:e]
+            books[uniques[code]] = _Book(targets[s:e][up], ids[s:e][up], targets[s:e][down], ids[s:e][down])
+        return cls(books)
+
+    def __len__(self):
+        return sum(len(book) for book in self._books.values())
+
+    @property
+    def tickers(self):
+        return [t for t, book in self._books.items() if len(book)]
+
+    def crossed(self, ticker, price):
+        """Labels of the alerts on ``ticker`` crossed by ``price``; touches only that ticker's book."""
+        book = self._books.get(ticker)
+        if book is None or not price > 0: return _NONE
+        up, down = book.crossed(price)
+        if not len(down): return up
+        if not len(up): return down
+        return np.concatenate((up, down))
+
+    def evaluate(self, prices):
+        """Return the frame labels of every alert crossed by the ``{ticker: price}`` snapshot."""
+        hits = [h for h in (self.crossed(tkr, price) for tkr, price in prices.items()) if len(h)]
+        if not hits: return _NONE
+        return np.concatenate(hits)
+
+    def discard(self, ids, ticker=None):
+        """Remove fired alerts so the next evaluation does not report them again."""
+        if not len(ids): return
+        books = [self._books[ticker]] if ticker in self._books else self._books.values()
+        for book in books: book.drop(ids)
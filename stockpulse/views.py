@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# ACTIVE-TAB GRID
+# ==========================================
+# Everything the Active tab computes before handing rows to st.data_editor,
+# kept free of Streamlit so it can be timed offline.
+
+def page_count(rows, page_size):
+    return max(1, -(-rows // page_size))
+
+def active_grid(frame, page=1, page_size=50):
+    """The editable grid for one page of active alerts, indexed by alert_id.
+
+    Returns ``(grid, active_rows)``; ``grid`` is empty when nothing is active.
+    """
+    active = frame[frame['status'] == 'Active']
+    view = active.iloc[(page - 1) * page_size: page * page_size]
+    grid = pd.DataFrame({
+        "sel": False,
+        "ticker": view['ticker'].to_numpy(),
+        "target_price": view['target_price'].to_numpy(),
+        "current_price": view['current_price'].to_numpy(),
+        "direction": view['direction'].to_numpy(),
+        "notes": view['notes'].astype(str).to_numpy(),
+    }, index=pd.Index(view['alert_id'].to_numpy(), name="alert_id"))
+    grid["gap"] = np.where(grid["target_price"] > 0, (grid["current_price"] - grid["target_price"]) / grid["target_price"] * 100, 0.0)
+    return grid, len(active)